@@ -0,0 +1,152 @@
+"""
+This module precomputes revenue, budget and profit aggregates of the catalog
+"""
+
+import numpy as np
+import pandas as pd
+
+MEASURES = ('revenue', 'budget', 'profit')
+DIMENSIONS = ('original_language', 'genres', 'release_year')
+
+
+def _cells(df, keys):
+    """
+    count, mean, M2, min and max of every measure per keys group.
+
+    M2 is the sum of squared deviations from the cell mean (0 for empty cells).
+    """
+    frame = pd.concat([df[keys], df[list(MEASURES)].astype(float)], axis=1)
+    grouped = frame.groupby(keys, dropna=False, sort=True, observed=True)
+    parts = {}
+    for measure in MEASURES:
+        count = grouped[measure].count()
+        parts[f'{measure}_count'] = count
+        parts[f'{measure}_mean'] = grouped[measure].mean()
+        parts[f'{measure}_m2'] = (grouped[measure].var(ddof=0) * count).fillna(0)
+        parts[f'{measure}_min'] = grouped[measure].min()
+        parts[f'{measure}_max'] = grouped[measure].max()
+    return pd.DataFrame(parts).reset_index()
+
+
+def merge_moments(count, mean, m2, groups, size):
+    """
+    Combine the count, mean and M2 of cells into those of groups of cells.
+
+    Uses the pairwise update of Chan et al.: a group's M2 is the sum of its
+    cells' M2 plus each cell's count times the squared distance of its mean to
+    the group mean. Unlike sum-of-squares formulas, nothing large cancels.
+
+    Args:
+    - count, mean, m2 (ndarray): Moments of each cell.
+    - groups (ndarray): Group (0 to size - 1) of each cell.
+    - size (int): Number of groups.
+
+    Returns:
+    - tuple: count, mean and M2 per group (mean and M2 NaN for empty groups).
+    """
+    count = np.asarray(count, dtype=float)
+    mean = np.where(count > 0, mean, 0.0)
+    total = np.bincount(groups, weights=count, minlength=size)
+    present = total > 0
+    group_mean = np.full(size, np.nan)
+    group_mean[present] = np.bincount(groups, weights=count * mean, minlength=size)[present] / total[present]
+    spread = count * (mean - np.nan_to_num(group_mean)[groups]) ** 2
+    group_m2 = np.bincount(groups, weights=np.where(count > 0, m2, 0.0) + spread, minlength=size)
+    group_m2[~present] = np.nan
+    return total, group_mean, group_m2
+
+
+def _std(count, m2):
+    """ sample standard deviation from count and M2 (NaN below two values) """
+    count = np.asarray(count, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 1, np.sqrt(np.asarray(m2) / (count - 1)), np.nan)
+
+
+class AggregateCube:
+    """
+    Aggregates of revenue, budget and profit per (original_language, genre, release_year).
+
+    Built once at load time. Bar, line and summary charts roll the cells up
+    instead of scanning the catalog, so their cost depends on the number of
+    cells (a few thousand) rather than the number of movies.
+
+    Attributes:
+    - genre_cells (DataFrame): Cells per (original_language, genres, release_year),
+      counting a movie once for each of its genres.
+    - movie_cells (DataFrame): Cells per (original_language, release_year),
+      counting every movie once.
+    """
+
+    def __init__(self, db):
+        """
+        Build the cube.
+
+        Args:
+        - db (MovieDB): The catalog.
+        """
+        df = db.orig_df[['original_language', 'genres', 'release_year'] + list(MEASURES)]
+        self.movie_cells = _cells(df, ['original_language', 'release_year'])
+        self.genre_cells = _cells(db.get_separated_genres(df), list(DIMENSIONS))
+
+    def select(self, where=None, by_genre=False):
+        """
+        Return the cells matching where.
+
+        Genre cells are used when grouping or filtering by genre; otherwise
+        movie cells, so a movie with several genres is only counted once.
+        """
+        where = where or {}
+        cells = self.genre_cells if by_genre or 'genres' in where else self.movie_cells
+        for dimension, value in where.items():
+            values = value if isinstance(value, (list, tuple, set, np.ndarray)) else [value]
+            cells = cells[cells[dimension].isin(values)]
+        return cells
+
+    def rollup(self, by, where=None, measures=MEASURES):
+        """
+        Aggregate the cube by some dimensions.
+
+        Args:
+        - by (list): Dimensions to group by.
+        - where (dict): dimension -> value or list of values to keep.
+        - measures (tuple): Measures to report.
+
+        Returns:
+        - DataFrame: One row per group with <measure>_count, _mean, _std, _min
+          and _max columns. Groups with a missing key are left out.
+        """
+        cells = self.select(where, by_genre='genres' in by)
+        grouped = cells.groupby(list(by), sort=True, observed=True)
+        result = pd.DataFrame(index=grouped.size().index)
+        # Group of each cell; cells with a missing key get NaN and are left out
+        groups = grouped.ngroup().to_numpy()
+        kept = ~np.isnan(groups)
+        groups = groups[kept].astype(np.int64)
+        for measure in measures:
+            count, mean, m2 = merge_moments(cells[f'{measure}_count'].to_numpy()[kept],
+                                            cells[f'{measure}_mean'].to_numpy()[kept],
+                                            cells[f'{measure}_m2'].to_numpy()[kept], groups, len(result))
+            result[f'{measure}_count'] = count.astype(np.int64)
+            result[f'{measure}_mean'] = mean
+            result[f'{measure}_std'] = _std(count, m2)
+            result[f'{measure}_min'] = grouped[f'{measure}_min'].min()
+            result[f'{measure}_max'] = grouped[f'{measure}_max'].max()
+        return result.reset_index()
+
+    def summary(self, where=None, measures=MEASURES):
+        """
+        Count, mean, std, min and max of each measure over all matching movies.
+
+        Returns:
+        - DataFrame: Rows count/mean/std/min/max, one column per measure.
+        """
+        cells = self.select(where)
+        summary = {}
+        groups = np.zeros(len(cells), dtype=np.int64)
+        for measure in measures:
+            count, mean, m2 = merge_moments(cells[f'{measure}_count'].to_numpy(), cells[f'{measure}_mean'].to_numpy(),
+                                            cells[f'{measure}_m2'].to_numpy(), groups, 1)
+            summary[measure] = [int(count[0]), mean[0], _std(count, m2)[0],
+                                cells[f'{measure}_min'].min(), cells[f'{measure}_max'].max()]
+        return pd.DataFrame(summary, index=['count', 'mean', 'std', 'min', 'max'])
@@ -0,0 +1,305 @@
+"""
+asyncio version of the link enrichment in temp.py
+
+Usage: python async_links.py [orig_movie.csv] [orig_movie_with_links.csv] [--concurrency 100] [--rate 20]
+                             [--ttl-days 30] [--base-url http://localhost:8080]
+
+Instead of one thread per lookup, a fixed number of asyncio workers share one
+pooled HTTP session (aiohttp), so hundreds of lookups can wait on the network
+at once on a single core. It writes the same journal and output as temp.py,
+so the two can resume each other's runs, and is incremental in the same way.
+
+Fetchers are pluggable: anything with ``async fetch(title) -> entry`` works,
+where entry is the dict LinkFetcher.fetch returns. HttpLinkFetcher talks to
+IMDb, or to any server given as base_url (e.g. a local mock serving
+``/find/?q=<title>`` and ``/title/<id>/`` pages) for testing.
+"""
+import abc
+import argparse
+import asyncio
+import io
+import json
+import random
+import time
+import urllib.parse
+import movieposters as mp
+
+if __package__:
+    from .temp import MISSING_LINK, finish_run, journal_entry, journal_path_for, prepare_run
+else:  # run as a script: temp.py sits next to this file
+    from temp import MISSING_LINK, finish_run, journal_entry, journal_path_for, prepare_run
+
+try:
+    import aiohttp
+except ImportError:  # only needed by HttpLinkFetcher
+    aiohttp = None
+
+IMDB_URL = 'https://imdb.com'
+
+
+class TransientError(Exception):
+    """ a request that may succeed if tried again (throttled, server error, network) """
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket for coroutines: at most rate requests per second on average,
+    with bursts of up to burst requests.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        """ wait until a token is available and take it """
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class FetchStats:
+    """
+    Throughput and error counts of a run.
+
+    Attributes:
+    - counts (dict): Movies per status (ok, not_found, failed).
+    - requests (int): HTTP requests sent, retries included.
+    - retries (int): Requests retried after a transient error.
+    - errors (dict): Failed requests per error type.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.counts = {'ok': 0, 'not_found': 0, 'failed': 0}
+        self.requests = 0
+        self.retries = 0
+        self.errors = {}
+
+    def add_error(self, error):
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self):
+        """ one line summary: movies/s, requests/s and error rates """
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        done = sum(self.counts.values())
+        error_count = sum(self.errors.values())
+        errors = ', '.join(f'{name}: {count}' for name, count in sorted(self.errors.items())) or 'none'
+        return (f"{done} movies in {elapsed:.1f}s ({done / elapsed:.1f} movies/s, "
+                f"{self.requests / elapsed:.1f} requests/s); "
+                f"failed {self.counts['failed'] / max(done, 1):.1%} of movies, "
+                f"{error_count / max(self.requests, 1):.1%} of requests errored ({errors})")
+
+
+class AsyncLinkFetcher(abc.ABC):
+    """
+    Base class of asyncio fetchers: rate limiting, retries and the entry format.
+
+    Subclasses implement imdb_link(title) and poster_link(imdb_link), raising
+    movieposters' MovieNotFound/PosterNotFound for missing movies and
+    TransientError for anything worth retrying.
+
+    Attributes:
+    - bucket (AsyncTokenBucket): Shared rate limit of every request, or None.
+    - retries (int): Retries of a request failing with a transient error.
+    - stats (FetchStats): Counts of this fetcher's requests.
+    """
+
+    def __init__(self, rate=20, retries=4, base_delay=1.0, max_delay=60.0):
+        self.bucket = AsyncTokenBucket(rate) if rate else None
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = FetchStats()
+
+    @abc.abstractmethod
+    async def imdb_link(self, title):
+        """ the IMDb link of title """
+
+    @abc.abstractmethod
+    async def poster_link(self, imdb_link):
+        """ the poster link of the movie at imdb_link """
+
+    async def request(self, lookup, argument):
+        """ one rate-limited lookup, retried with exponential backoff and full jitter """
+        for attempt in range(self.retries + 1):
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            self.stats.requests += 1
+            try:
+                return await lookup(argument)
+            except TransientError as error:
+                self.stats.add_error(error.__cause__ or error)
+                if attempt == self.retries:
+                    raise
+                self.stats.retries += 1
+                await asyncio.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+            except (mp.MovieNotFound, mp.PosterNotFound):
+                raise
+            except Exception as error:
+                # Not worth retrying (e.g. HTTP 403), but still an errored request
+                self.stats.add_error(error)
+                raise
+
+    async def fetch(self, title):
+        """
+        Look up both links of a title.
+
+        Returns:
+        - dict: status ('ok', 'not_found' or 'failed'), imdb_link, poster_link
+          and, unless ok, error (as temp.LinkFetcher.fetch).
+        """
+        entry = {'status': 'ok', 'imdb_link': MISSING_LINK, 'poster_link': MISSING_LINK}
+        try:
+            entry['imdb_link'] = await self.request(self.imdb_link, title)
+            entry['poster_link'] = await self.request(self.poster_link, entry['imdb_link'])
+        except (mp.MovieNotFound, mp.PosterNotFound) as error:
+            # Keep whatever was found: a movie without a poster still has its IMDb link
+            entry['status'] = 'ok' if entry['imdb_link'] != MISSING_LINK else 'not_found'
+            entry['error'] = repr(error)
+        except Exception as error:
+            entry['status'] = 'failed'
+            entry['error'] = repr(error)
+        self.stats.counts[entry['status']] += 1
+        return entry
+
+    async def close(self):
+        """ release the fetcher's connections """
+
+
+class HttpLinkFetcher(AsyncLinkFetcher):
+    """
+    Fetches links from IMDb (or a server mimicking it) over one pooled aiohttp session.
+
+    Pages are parsed with movieposters' own parsers. Links are always stored
+    as imdb.com links, whatever base_url is.
+
+    Attributes:
+    - base_url (str): Server to query instead of https://imdb.com.
+    - session (aiohttp.ClientSession): Keep-alive connection pool, at most
+      concurrency connections.
+    """
+
+    def __init__(self, base_url=IMDB_URL, concurrency=100, timeout=30, **kwargs):
+        if aiohttp is None:
+            raise ImportError('HttpLinkFetcher needs aiohttp: pip install aiohttp')
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip('/')
+        connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, headers=mp.headers.HEADERS,
+                                             timeout=aiohttp.ClientTimeout(total=timeout))
+
+    async def get(self, url):
+        """ GET url and return the body; 404 means the movie does not exist """
+        try:
+            async with self.session.get(url) as response:
+                if response.status == 404:
+                    raise mp.MovieNotFound(url)
+                if response.status == 429 or response.status >= 500:
+                    raise TransientError(f'HTTP {response.status} for {url}')
+                response.raise_for_status()
+                return await response.read()
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as error:
+            raise TransientError(f'{type(error).__name__} for {url}') from error
+
+    async def imdb_link(self, title):
+        body = await self.get(f'{self.base_url}/find/?s=tt&q={urllib.parse.quote_plus(title)}')
+        try:
+            return mp.get_imdb_link_from_response(io.BytesIO(body))
+        except mp.MovieNotFound:
+            raise mp.MovieNotFound(f'{title!r} not found on IMDb')
+
+    async def poster_link(self, imdb_link):
+        path = urllib.parse.urlsplit(imdb_link).path
+        body = await self.get(self.base_url + path)
+        return mp.get_poster_link_from_response(io.BytesIO(body))
+
+    async def close(self):
+        await self.session.close()
+
+
+async def enrich_async(input_path, output_path, fetcher, concurrency=100, id_column='id', title_column='title',
+                       ttl=None, progress_every=1000):
+    """
+    Add imdb_link and poster_link columns to input_path with an asyncio fetcher.
+
+    Args:
+    - input_path: CSV with id_column and title_column.
+    - output_path: Where to write the CSV with links (journal next to it).
+    - fetcher: AsyncLinkFetcher (or anything with async fetch(title)).
+    - concurrency: Most lookups in flight at once.
+    - ttl: Seconds after which known links are fetched again (default: never).
+
+    Returns:
+    - dict: How many movies were skipped (already known), ok, not_found and failed.
+    """
+    df, keys, entries, todo = prepare_run(input_path, output_path, id_column, title_column, ttl)
+    journal_path = journal_path_for(output_path)
+    counts = {'skipped': len(keys) - len(todo), 'ok': 0, 'not_found': 0, 'failed': 0}
+
+    # Bounded queue: the producer never gets far ahead of the workers
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    with open(journal_path, 'a', encoding='utf-8') as journal:
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                key, title = item
+                entry = journal_entry(key, title, await fetcher.fetch(title))
+                entries[key] = entry
+                journal.write(json.dumps(entry) + '\n')
+                # Flushed per movie, so a crash loses at most the lookups in flight
+                journal.flush()
+                counts[entry['status']] += 1
+                done = counts['ok'] + counts['not_found'] + counts['failed']
+                if done % progress_every == 0 or done == len(todo):
+                    stats = getattr(fetcher, 'stats', None)
+                    print(stats.report() if stats else f'Processed {done}/{len(todo)} movies')
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        for item in todo:
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    finish_run(df, keys, entries, output_path)
+    return counts
+
+
+async def run(args):
+    fetcher = HttpLinkFetcher(base_url=args.base_url, concurrency=args.concurrency, rate=args.rate,
+                              retries=args.retries)
+    try:
+        ttl = args.ttl_days * 86400 if args.ttl_days is not None else None
+        counts = await enrich_async(args.input, args.output, fetcher, concurrency=args.concurrency, ttl=ttl)
+    finally:
+        await fetcher.close()
+    print('finished', counts)
+    print(fetcher.stats.report())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Add IMDb and poster links to a movie CSV with asyncio.')
+    parser.add_argument('input', nargs='?', default='orig_movie.csv')
+    parser.add_argument('output', nargs='?', default='orig_movie_with_links.csv')
+    parser.add_argument('--concurrency', type=int, default=100, help='lookups (and connections) in flight at once')
+    parser.add_argument('--rate', type=float, default=20, help='requests per second (0: unlimited)')
+    parser.add_argument('--retries', type=int, default=4, help='retries of transient network errors')
+    parser.add_argument('--ttl-days', type=float, help='fetch links again once they are this old')
+    parser.add_argument('--base-url', default=IMDB_URL, help='server to query instead of IMDb (e.g. a mock)')
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
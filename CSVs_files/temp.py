@@ -1,57 +1,376 @@
-from http.client import IncompleteRead
+"""
+Adds IMDb and poster links to a movie CSV, as a resumable, rate-limited job
+
+Usage: python temp.py [orig_movie.csv] [orig_movie_with_links.csv] [--workers 20] [--rate 10] [--ttl-days 30]
+
+Every finished movie is appended to a journal next to the output
+(``<output>.journal.jsonl``) as soon as its lookups are done, so a crashed or
+interrupted run picks up where it stopped instead of starting over. Movies
+that were not found are final; movies that failed (network errors after all
+retries) are tried again on the next run. The output CSV is rebuilt from the
+input and the journal at the end of every run.
+
+Runs are incremental: the input is compared with what is already known by
+movie id (the journal, or an existing output CSV without one), and only new
+movies, movies whose title changed, failed ones and, with a TTL, links older
+than the TTL are fetched.
+
+The lookups are plain callables, so tests can swap movieposters for a stub:
+
+    enrich('in.csv', 'out.csv', fetcher=LinkFetcher(imdb_lookup=fake_search, poster_lookup=fake_poster))
+"""
+import argparse
+import json
+import os
+import random
+import threading
 import time
+import urllib.error
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.client import IncompleteRead
+import movieposters as mp
 import movieposters.errors
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
-import movieposters as mp
 
-def get_imdb_link(title):
-    return mp.get_imdb_link_from_title(title)
+MISSING_LINK = 'N/A'
+OUTPUT_COLUMNS = ('imdb_link', 'poster_link')
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: at most rate calls per second on average, with
+    bursts of up to burst calls.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ wait until a token is available and take it """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+def is_transient(error):
+    """ whether a failed lookup is worth retrying """
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, (IncompleteRead, urllib.error.URLError, ConnectionError, TimeoutError))
+
+
+def with_backoff(call, retries=4, base_delay=1.0, max_delay=60.0, sleep=time.sleep):
+    """
+    Call call(), retrying transient errors with exponential backoff and full jitter.
 
-def get_poster_link(imdb_link):
-    retries = 3
-    for _ in range(retries):
+    Other errors (e.g. MovieNotFound) are raised at once.
+    """
+    for attempt in range(retries + 1):
         try:
-            return mp.get_poster_from_imdb_link(imdb_link)
-        except IncompleteRead:
-            time.sleep(1)  # Wait for a second before retrying
-            continue
-    return 'N/A'  # Return a fallback value if all retries fail
-
-df = pd.read_csv('orig_movie.csv', lineterminator='\n')
-num_threads = 20
-chunks = [df[i:i + num_threads] for i in range(0, len(df), num_threads)]
-total_chunks = len(chunks)
-processed_chunks = 0
-
-def process_chunk(chunk):
-    imdb_links_list = []
-    poster_links_list = []
-    for title in chunk['title']:
+            return call()
+        except Exception as error:
+            if attempt == retries or not is_transient(error):
+                raise
+            sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+def get_poster_from_imdb_link(link):
+    """
+    The poster link of the movie at an IMDb link.
+
+    movieposters' own version turns every HTTP error into MovieNotFound,
+    which would make a throttled (429) or failing (5xx) request final. Here
+    only a 404 means the movie does not exist; other HTTP errors are raised
+    as they are, so is_transient() can retry them.
+    """
+    request = urllib.request.Request(link, headers=mp.headers.HEADERS)
+    try:
+        response = urllib.request.urlopen(request)
+    except urllib.error.HTTPError as error:
+        if error.code == 404:
+            raise movieposters.errors.MovieNotFound(link) from error
+        raise
+    with response:
+        return mp.get_poster_link_from_response(response)
+
+
+class LinkFetcher:
+    """
+    Looks up the IMDb and poster links of a title.
+
+    Attributes:
+    - imdb_lookup (callable): title -> IMDb link; raises MovieNotFound.
+    - poster_lookup (callable): IMDb link -> poster link; raises PosterNotFound.
+    - bucket (TokenBucket): Shared rate limit for every request, or None.
+    - retries (int): Retries of a request failing with a transient error.
+    """
+
+    def __init__(self, imdb_lookup=mp.get_imdb_link_from_title, poster_lookup=get_poster_from_imdb_link,
+                 rate=10, retries=4, base_delay=1.0):
+        self.imdb_lookup = imdb_lookup
+        self.poster_lookup = poster_lookup
+        self.bucket = TokenBucket(rate) if rate else None
+        self.retries = retries
+        self.base_delay = base_delay
+
+    def request(self, lookup, argument):
+        """ one rate-limited lookup, retried with backoff """
+        def call():
+            if self.bucket is not None:
+                self.bucket.acquire()
+            return lookup(argument)
+        return with_backoff(call, self.retries, self.base_delay)
+
+    def fetch(self, title):
+        """
+        Look up both links of a title.
+
+        Returns:
+        - dict: status ('ok', 'not_found' or 'failed'), imdb_link, poster_link
+          and, unless ok, error.
+        """
+        entry = {'status': 'ok', 'imdb_link': MISSING_LINK, 'poster_link': MISSING_LINK}
         try:
-            imdb_link = get_imdb_link(title)
-            poster_link = get_poster_link(imdb_link)
-            imdb_links_list.append(imdb_link)
-            poster_links_list.append(poster_link)
-        except movieposters.errors.MovieNotFound:
-            pass
-    return imdb_links_list, poster_links_list
-
-with ThreadPoolExecutor(max_workers=num_threads) as executor:
-    results = executor.map(process_chunk, chunks)
-
-    for result in results:
-        processed_chunks += 1
-        progress = processed_chunks / total_chunks * 100
-        print(f"Processed {processed_chunks}/{total_chunks} chunks ({progress:.2f}%)")
-
-imdb_links = []
-poster_links = []
-for imdb, poster in results:
-    imdb_links.extend(imdb)
-    poster_links.extend(poster)
-df['imdb_link'] = imdb_links
-df['poster_link'] = poster_links
-
-df.to_csv('orig_movie_with_links', index=False)
-print('finished')
+            entry['imdb_link'] = self.request(self.imdb_lookup, title)
+            entry['poster_link'] = self.request(self.poster_lookup, entry['imdb_link'])
+        except (movieposters.errors.MovieNotFound, movieposters.errors.PosterNotFound) as error:
+            # Keep whatever was found: a movie without a poster still has its IMDb link
+            entry['status'] = 'ok' if entry['imdb_link'] != MISSING_LINK else 'not_found'
+            entry['error'] = repr(error)
+        except Exception as error:
+            entry['status'] = 'failed'
+            entry['error'] = repr(error)
+        return entry
+
+
+def journal_path_for(output_path):
+    """ return the journal used for output_path """
+    return output_path + '.journal.jsonl'
+
+
+def read_journal(path):
+    """
+    Load the journal as {key: entry}; later lines win.
+
+    A line cut off by a crash is ignored.
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry['key']] = entry
+    return entries
+
+
+def movie_keys(df, id_column):
+    """ the journal key of every row: its movie id, or its row label without an id column """
+    keys = df[id_column] if id_column in df.columns else df.index.to_series()
+    return keys.astype(str).tolist()
+
+
+def read_existing_output(output_path, id_column, title_column='title'):
+    """
+    Entries for the movies of an output CSV written without a journal.
+
+    Movies without an IMDb link count as failed, so they are tried again.
+    Titles are kept so a later retitle is noticed.
+    Returns {} when there is no such file or it has no id column.
+    """
+    if not os.path.exists(output_path):
+        return {}
+    existing = pd.read_csv(output_path, lineterminator='\n')
+    if id_column not in existing.columns or not set(OUTPUT_COLUMNS) <= set(existing.columns):
+        return {}
+    fetched_at = os.path.getmtime(output_path)
+    titles = existing[title_column] if title_column in existing.columns else [None] * len(existing)
+    entries = {}
+    for key, title, imdb_link, poster_link in zip(movie_keys(existing, id_column), titles, existing['imdb_link'],
+                                                  existing['poster_link']):
+        found = isinstance(imdb_link, str) and imdb_link != MISSING_LINK
+        entries[key] = {'key': key, 'status': 'ok' if found else 'failed', 'fetched_at': fetched_at,
+                        'imdb_link': imdb_link if found else MISSING_LINK,
+                        'poster_link': poster_link if isinstance(poster_link, str) else MISSING_LINK}
+        if title is not None:
+            entries[key]['title'] = title
+    return entries
+
+
+def same_title(known, title):
+    """ whether two titles are equal; two missing titles (NaN) are equal too """
+    if pd.isna(known) or pd.isna(title):
+        return pd.isna(known) and pd.isna(title)
+    return known == title
+
+
+def movies_to_fetch(df, keys, entries, title_column='title', ttl=None, now=None):
+    """
+    Movies whose links must be fetched, each id once.
+
+    Args:
+    - ttl: Seconds after which links are fetched again (default: never).
+
+    Returns:
+    - list: (key, title) pairs.
+    - dict: How many movies are new, changed (title differs), failed and stale.
+    """
+    now = time.time() if now is None else now
+    todo = {}
+    reasons = {'new': 0, 'changed': 0, 'failed': 0, 'stale': 0}
+    for key, title in zip(keys, df[title_column]):
+        if key in todo:
+            continue
+        entry = entries.get(key)
+        if entry is None:
+            reason = 'new'
+        elif 'title' in entry and not same_title(entry['title'], title):
+            reason = 'changed'
+        elif entry['status'] == 'failed':
+            reason = 'failed'
+        elif ttl is not None and now - entry.get('fetched_at', 0) > ttl:
+            reason = 'stale'
+        else:
+            continue
+        todo[key] = title
+        reasons[reason] += 1
+    return list(todo.items()), reasons
+
+
+def prepare_run(input_path, output_path, id_column='id', title_column='title', ttl=None):
+    """
+    Load the input and everything already known about it.
+
+    Returns:
+    - df, keys (journal key per row), entries ({key: entry}) and todo ((key, title) to fetch).
+    """
+    df = pd.read_csv(input_path, lineterminator='\n')
+    keys = movie_keys(df, id_column)
+    entries = read_existing_output(output_path, id_column, title_column)
+    entries.update(read_journal(journal_path_for(output_path)))
+    todo, reasons = movies_to_fetch(df, keys, entries, title_column, ttl)
+    print(f"{len(keys)} movies, fetching {len(todo)}: "
+          + ', '.join(f'{count} {reason}' for reason, count in reasons.items()))
+    return df, keys, entries, todo
+
+
+def journal_entry(key, title, result):
+    """ the journal line of a fetched movie """
+    return dict(result, key=key, title=title, fetched_at=time.time())
+
+
+def write_output(df, keys, entries, output_path):
+    """ write df with the journal's links, replacing output_path atomically """
+    result = df.copy()
+    for column in OUTPUT_COLUMNS:
+        result[column] = [entries[key][column] if key in entries else MISSING_LINK for key in keys]
+    temp_path = output_path + '.tmp'
+    result.to_csv(temp_path, index=False)
+    os.replace(temp_path, output_path)
+    return result
+
+
+def finish_run(df, keys, entries, output_path):
+    """
+    Write the output and compact the journal to one line per movie of the input.
+
+    Both files are replaced atomically, so a crash here loses nothing.
+    """
+    write_output(df, keys, entries, output_path)
+    journal_path = journal_path_for(output_path)
+    temp_path = journal_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as journal:
+        for key in dict.fromkeys(keys):
+            if key in entries:
+                journal.write(json.dumps(entries[key]) + '\n')
+    os.replace(temp_path, journal_path)
+
+
+def enrich(input_path, output_path, fetcher=None, workers=20, id_column='id', title_column='title',
+           ttl=None, progress_every=100):
+    """
+    Add imdb_link and poster_link columns to input_path, writing output_path.
+
+    Args:
+    - input_path: CSV with id_column and title_column.
+    - output_path: Where to write the CSV with links.
+    - fetcher: LinkFetcher to use (default: movieposters, 10 requests/s).
+    - workers: Most lookups in flight at once.
+    - id_column: Column identifying a movie (the row label if missing).
+    - title_column: Column with the title to search for.
+    - ttl: Seconds after which known links are fetched again (default: never).
+
+    Returns:
+    - dict: How many movies were skipped (already known), ok, not_found and failed.
+    """
+    fetcher = fetcher or LinkFetcher()
+    df, keys, entries, todo = prepare_run(input_path, output_path, id_column, title_column, ttl)
+    journal_path = journal_path_for(output_path)
+    counts = {'skipped': len(keys) - len(todo), 'ok': 0, 'not_found': 0, 'failed': 0}
+
+    started = time.perf_counter()
+    with open(journal_path, 'a', encoding='utf-8') as journal, ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        remaining = iter(todo)
+        done_count = 0
+        next_report = progress_every
+        while True:
+            # Keep a bounded window in flight instead of queueing every movie
+            while len(pending) < workers * 2:
+                item = next(remaining, None)
+                if item is None:
+                    break
+                pending[executor.submit(fetcher.fetch, item[1])] = item
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key, title = pending.pop(future)
+                entry = journal_entry(key, title, future.result())
+                entries[key] = entry
+                journal.write(json.dumps(entry) + '\n')
+                counts[entry['status']] += 1
+                done_count += 1
+            journal.flush()
+            if done_count >= next_report or done_count == len(todo):
+                next_report = done_count + progress_every
+                rate = done_count / max(time.perf_counter() - started, 1e-9)
+                print(f"Processed {done_count}/{len(todo)} movies ({rate:.1f}/s, {counts['failed']} failed)")
+
+    finish_run(df, keys, entries, output_path)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Add IMDb and poster links to a movie CSV.')
+    parser.add_argument('input', nargs='?', default='orig_movie.csv')
+    parser.add_argument('output', nargs='?', default='orig_movie_with_links.csv')
+    parser.add_argument('--workers', type=int, default=20, help='lookups in flight at once')
+    parser.add_argument('--rate', type=float, default=10, help='requests per second (0: unlimited)')
+    parser.add_argument('--retries', type=int, default=4, help='retries of transient network errors')
+    parser.add_argument('--ttl-days', type=float, help='fetch links again once they are this old')
+    args = parser.parse_args(argv)
+
+    fetcher = LinkFetcher(rate=args.rate, retries=args.retries)
+    ttl = args.ttl_days * 86400 if args.ttl_days is not None else None
+    counts = enrich(args.input, args.output, fetcher, workers=args.workers, ttl=ttl)
+    print('finished', counts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+This module keeps a binary, column-per-file cache of the catalog CSV
+
+The cache lives in a directory next to the CSV (``movies_with_links.csv.cache``).
+Each column is stored as NumPy ``.npy`` files that can be memory-mapped:
+
+- numeric, bool and datetime columns are stored as-is;
+- text columns are stored as one UTF-8 blob (values separated by NUL) plus an
+  int64 offsets array, so a single value can be read without decoding the rest
+  (see TextColumn).
+
+``manifest.json`` records the column layout together with the size, mtime and
+SHA-1 of the CSV it was built from. The cache is rebuilt whenever the CSV changes.
+A build is written to a temporary sibling directory and renamed into place, so a
+half-written cache is never read. A reader can still find the cache it read the
+manifest of moved away by a rebuild; read_cache() then starts over with the new one.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+MANIFEST = 'manifest.json'
+SEPARATOR = '\x00'
+# Times a read starts over when a rebuild moves the cache away under it
+READ_ATTEMPTS = 3
+
+
+def cache_dir_for(csv_path):
+    """ return the cache directory used for csv_path """
+    return csv_path + '.cache'
+
+
+def file_signature(path):
+    """ cheap change detection: size and modification time """
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """ SHA-1 of the file contents """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _column_kind(series):
+    if pd.api.types.is_bool_dtype(series):
+        return 'bool'
+    if pd.api.types.is_datetime64_dtype(series):
+        return 'datetime'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    return 'text'
+
+
+def _write_text(directory, stem, series):
+    """ store a text column as a NUL separated blob with byte offsets """
+    missing = series.isna().to_numpy()
+    # astype(object) first: a category column has no '' category to fill with
+    values = series.astype(object).where(~missing, '').astype(str)
+    if values.str.contains(SEPARATOR, regex=False).any():
+        raise ValueError(f'column {series.name!r} contains NUL characters')
+    encoded = [value.encode('utf-8') for value in values]
+    lengths = np.fromiter((len(value) + 1 for value in encoded), dtype=np.int64, count=len(encoded))
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    blob = np.frombuffer(SEPARATOR.encode().join(encoded) + SEPARATOR.encode(), dtype=np.uint8)
+    np.save(os.path.join(directory, f'{stem}.blob.npy'), blob)
+    np.save(os.path.join(directory, f'{stem}.offsets.npy'), offsets)
+    if missing.any():
+        np.save(os.path.join(directory, f'{stem}.na.npy'), missing)
+    return bool(missing.any())
+
+
+def _read_text(directory, stem, has_na):
+    """ decode a whole text column back into an object array """
+    blob = np.load(os.path.join(directory, f'{stem}.blob.npy'), mmap_mode='r')
+    # The blob ends with a separator, so split() yields one trailing empty string
+    values = np.array(blob.tobytes().decode('utf-8').split(SEPARATOR)[:-1], dtype=object)
+    if has_na:
+        values[np.load(os.path.join(directory, f'{stem}.na.npy'))] = np.nan
+    return values
+
+
+class TextColumn:
+    """
+    A cached text column read one value at a time.
+
+    The blob and offsets are memory-mapped, so only the bytes of the values
+    asked for are ever read from disk. text_column[row] is the value of a
+    catalog row (NaN if missing).
+    """
+
+    def __init__(self, directory, stem, has_na):
+        self.blob = np.load(os.path.join(directory, f'{stem}.blob.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(directory, f'{stem}.offsets.npy'), mmap_mode='r')
+        self.missing = np.load(os.path.join(directory, f'{stem}.na.npy'), mmap_mode='r') if has_na else None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if self.missing is not None and self.missing[row]:
+            return np.nan
+        # Each value is followed by its separator
+        return self.blob[self.offsets[row]:self.offsets[row + 1] - 1].tobytes().decode('utf-8')
+
+
+def _open_text_columns(directory, entries, columns):
+    """ return a TextColumn for each text column of entries named in columns """
+    return {entry['name']: TextColumn(directory, entry['stem'], entry['has_na'])
+            for entry in entries if entry['name'] in columns and entry['kind'] == 'text'}
+
+
+def _publish(building, directory):
+    """ move the finished cache in building to directory, replacing an older cache """
+    try:
+        os.rename(building, directory)
+        return
+    except OSError:
+        pass
+    # An older cache is in the way: move it aside (open memory maps keep working)
+    retired = f'{directory}.old-{uuid.uuid4().hex}'
+    try:
+        os.rename(directory, retired)
+    except OSError:
+        # Already moved aside by another builder, or in use (Windows)
+        pass
+    try:
+        os.rename(building, directory)
+    except OSError:
+        # Another builder published first; its cache is just as good
+        pass
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def write_cache(df, csv_path, text_columns=()):
+    """
+    Write df as the binary cache of csv_path.
+
+    The cache is built in a temporary directory next to it and renamed into
+    place when complete, so a half-written cache is never picked up.
+
+    Args:
+    - text_columns: Text columns to open from this build (see open_cache()).
+
+    Returns:
+    - dict: Column name -> TextColumn, for the text_columns stored as text.
+    """
+    target = cache_dir_for(csv_path)
+    directory = f'{target}.tmp-{uuid.uuid4().hex}'
+    os.makedirs(directory)
+    try:
+        entries = _write_columns(df, csv_path, directory)
+        # Opened before publishing: the memory maps stay on this build even
+        # if another builder's cache ends up in place
+        texts = _open_text_columns(directory, entries, text_columns)
+        _publish(directory, target)
+        return texts
+    finally:
+        # Only still there if publishing lost to another builder or failed
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _write_columns(df, csv_path, directory):
+    """ write every column of df and the manifest into directory; return the manifest's column entries """
+    columns = []
+    for position, name in enumerate(df.columns):
+        stem = f'c{position}'
+        series = df[name]
+        kind = _column_kind(series)
+        entry = {'name': name, 'stem': stem, 'kind': kind}
+        if kind == 'text':
+            entry['has_na'] = _write_text(directory, stem, series)
+        elif kind == 'datetime':
+            np.save(os.path.join(directory, f'{stem}.npy'), series.to_numpy(dtype='datetime64[ns]'))
+        else:
+            np.save(os.path.join(directory, f'{stem}.npy'), series.to_numpy())
+        columns.append(entry)
+
+    manifest = {
+        'version': CACHE_VERSION,
+        'source': file_signature(csv_path),
+        'sha1': file_hash(csv_path),
+        'columns': columns,
+    }
+    with open(os.path.join(directory, MANIFEST), 'w') as file:
+        json.dump(manifest, file)
+    return columns
+
+
+def load_manifest(csv_path):
+    """ return the manifest if the cache is still valid for csv_path, else None """
+    manifest_path = os.path.join(cache_dir_for(csv_path), MANIFEST)
+    try:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != CACHE_VERSION:
+        return None
+
+    signature = file_signature(csv_path)
+    if manifest['source'] == signature:
+        return manifest
+    # Touched but maybe not changed (e.g. a fresh checkout): compare contents
+    if manifest['sha1'] != file_hash(csv_path):
+        return None
+    manifest['source'] = signature
+    temp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'w') as file:
+            json.dump(manifest, file)
+        os.replace(temp_path, manifest_path)
+    except OSError:
+        pass
+    return manifest
+
+
+def read_cache(csv_path, columns=None, mmap=True):
+    """
+    Load the cached catalog for csv_path.
+
+    Args:
+    - csv_path: The CSV the cache was built from.
+    - columns: Only load these columns (default: all of them). A column
+      the cache does not have raises KeyError.
+    - mmap: Memory-map numeric columns instead of reading them into memory.
+      The mapping is copy-on-write, so writes stay in memory.
+
+    Returns:
+    - DataFrame, or None when there is no valid cache.
+    """
+    loaded = open_cache(csv_path, columns, mmap=mmap)
+    return None if loaded is None else loaded[0]
+
+
+def open_cache(csv_path, columns=None, text_columns=(), mmap=True):
+    """
+    Load the cached catalog for csv_path together with some of its text columns.
+
+    The text columns come from the same build as the catalog, so their rows
+    stay the catalog's rows even if the cache is rebuilt later on.
+
+    Args:
+    - csv_path, columns, mmap: As for read_cache().
+    - text_columns: Text columns to open as TextColumns rather than load.
+
+    Returns:
+    - (DataFrame, dict): The catalog and column name -> TextColumn for the
+      text_columns stored as text; None when there is no valid cache.
+
+    Raises OSError if the cache keeps getting rebuilt under the read.
+    """
+    for attempt in range(READ_ATTEMPTS):
+        manifest = load_manifest(csv_path)
+        if manifest is None:
+            return None
+        try:
+            return _read_columns(cache_dir_for(csv_path), manifest['columns'], columns, text_columns, mmap)
+        except FileNotFoundError:
+            # A rebuild moved the cache away after its manifest was read
+            if attempt == READ_ATTEMPTS - 1:
+                raise
+
+
+def _read_columns(directory, entries, columns, text_columns, mmap):
+    """ load columns and open text_columns of the cache in directory """
+    texts = _open_text_columns(directory, entries, text_columns)
+    if columns is not None:
+        wanted = set(columns)
+        missing = wanted.difference(entry['name'] for entry in entries)
+        if missing:
+            raise KeyError(f'columns {sorted(missing)} are not in the cache in {directory}')
+        entries = [entry for entry in entries if entry['name'] in wanted]
+
+    data = {}
+    for entry in entries:
+        stem = entry['stem']
+        if entry['kind'] == 'text':
+            data[entry['name']] = _read_text(directory, stem, entry['has_na'])
+        else:
+            values = np.load(os.path.join(directory, f'{stem}.npy'), mmap_mode='c' if mmap else None)
+            data[entry['name']] = values.view(np.ndarray)
+    return pd.DataFrame(data, copy=False), texts
@@ -2,32 +2,294 @@
 This module handles data manipulation
 """
 
+import itertools
+import numpy as np
 import pandas as pd
 import os
+import threading
+import CatalogCache
+from AggregateCube import AggregateCube
+from MovieIndex import GenreIndex, SortIndex, TitleIndex, ValueIndex, YearIndex
 
+_shared_db = None
+# Callables told about every reload of the shared MovieDB
+_reload_listeners = []
+# Every catalog load gets a new version, so anything derived from an older
+# load (e.g. rendered charts) can tell it is stale
+_catalog_versions = itertools.count(1)
 
-def csv_loader(folder, csv_name):
+# In-memory dtype of catalog columns. Low-cardinality text becomes category and
+# numbers get the narrowest type holding them; unlisted columns keep pandas' default.
+CATALOG_SCHEMA = {
+    'id': 'uint32',
+    'original_language': 'category',
+    'genres': 'category',
+    'release_year': 'int16',
+    'vote_average': 'float32',
+    'popularity': 'float32',
+}
+# Long free text none of the pages show: left out of orig_df, see MovieDB.get_text()
+HEAVY_TEXT_COLUMNS = ('overview', 'tagline', 'production_companies')
+# Catalog columns each page reads. A MovieDB only loads the columns of the
+# pages it serves ('id' is always needed to find a movie).
+PAGE_COLUMNS = {
+    'search': ('id', 'title', 'release_year', 'genres', 'original_language', 'vote_average', 'popularity',
+               'imdb_link'),
+    'storytelling': ('id', 'original_language', 'genres', 'release_year', 'revenue', 'budget', 'profit'),
+    'exploration': ('id', 'original_language', 'genres', 'release_year', 'revenue', 'budget', 'profit'),
+}
+
+
+def page_columns(pages=None):
+    """ the columns needed by these pages (default: every page), in PAGE_COLUMNS order """
+    pages = PAGE_COLUMNS if pages is None else pages
+    return list(dict.fromkeys(column for page in pages for column in PAGE_COLUMNS[page]))
+
+
+def csv_loader(folder, csv_name, columns=None):
     current_dir = os.getcwd()
     path = os.path.join(current_dir,folder,csv_name)
-    data = pd.read_csv(path)
+    data = pd.read_csv(path, usecols=columns)
     return data
 
 
+def compact_dtypes(df, schema=CATALOG_SCHEMA):
+    """
+    Cast the columns of df to their schema dtype, in place.
+
+    An integer cast is skipped when the column has missing values or values
+    out of the type's range, so no data is ever changed.
+    """
+    for column, dtype in schema.items():
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        if dtype == 'category':
+            df[column] = df[column].astype('category')
+        elif np.dtype(dtype).kind in 'iu':
+            values = df[column]
+            limits = np.iinfo(dtype)
+            if values.isna().any() or values.min() < limits.min or values.max() > limits.max:
+                continue
+            df[column] = values.astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def memory_report(before, after):
+    """
+    Bytes per column of two versions of a frame (strings counted deeply).
+
+    Both frames must hold the same columns, so only dtypes are compared.
+
+    Returns:
+    - DataFrame: dtype and bytes before and after and their ratio per column,
+      plus a total row.
+    """
+    if set(before.columns) != set(after.columns):
+        raise ValueError(f'memory_report needs the same columns, got {sorted(before.columns)} '
+                         f'and {sorted(after.columns)}')
+    after = after[before.columns]
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+    })
+    report['dtype_after'] = after.dtypes.astype(str)
+    report['bytes_after'] = after.memory_usage(index=False, deep=True)
+    report.loc['total'] = ['', report['bytes_before'].sum(), '', report['bytes_after'].sum()]
+    report['ratio'] = (report['bytes_before'] / report['bytes_after'].replace(0, np.nan)).round(1)
+    return report
+
+
+def catalog_loader(folder, csv_name, columns=None):
+    """
+    Load the catalog from its binary cache, falling back to the CSV.
+
+    A CSV load (re)builds the cache so the next launch can skip parsing.
+    Columns get their CATALOG_SCHEMA dtypes either way.
+
+    Args:
+    - columns: Only load these columns (default: all of them). The cache is
+      always built with every column, so heavy text can be read from it later.
+      Asking for a column the catalog does not have raises instead of leaving it out.
+    """
+    return load_catalog(folder, csv_name, columns)[0]
+
+
+def load_catalog(folder, csv_name, columns=None, text_columns=()):
+    """
+    Load the catalog like catalog_loader() and open heavy text columns from the same load.
+
+    Args:
+    - columns: As for catalog_loader().
+    - text_columns: Text columns to open without loading them into the catalog.
+
+    Returns:
+    - (DataFrame, dict): The catalog and column name -> values by catalog row
+      (a CatalogCache.TextColumn, or an array when the cache couldn't be written).
+      Text columns that could not be opened are left out.
+    """
+    path = os.path.join(os.getcwd(), folder, csv_name)
+    try:
+        loaded = CatalogCache.open_cache(path, columns, text_columns)
+    except OSError:
+        # The cache kept being rebuilt under us: parse the CSV instead
+        loaded = None
+    if loaded is not None:
+        data, texts = loaded
+        return compact_dtypes(data), texts
+
+    if not os.access(os.path.dirname(path), os.W_OK):
+        # No cache can be written here: parse only what is needed
+        data = csv_loader(folder, csv_name, columns)
+        if 'release_date' in data.columns:
+            data['release_date'] = pd.to_datetime(data['release_date'])
+        return compact_dtypes(data), {}
+
+    data = csv_loader(folder, csv_name)
+    data['release_date'] = pd.to_datetime(data['release_date'])
+    compact_dtypes(data)
+    try:
+        texts = CatalogCache.write_cache(data, path, text_columns)
+    except (OSError, ValueError):
+        # Data the cache can't hold: just keep using the CSV, and the text already parsed
+        texts = {column: data[column].to_numpy() for column in text_columns if column in data.columns}
+    if columns is not None:
+        missing = set(columns).difference(data.columns)
+        if missing:
+            raise KeyError(f'columns {sorted(missing)} are not in {path}')
+        data = data[[column for column in data.columns if column in columns]]
+    return data, texts
+
+
 class MovieDB:
-    def __init__(self):
-        self.orig_df = csv_loader(os.getcwd(), 'movies_with_links.csv')
-        self.orig_df['release_date'] = pd.to_datetime(self.orig_df['release_date'])
+    def __init__(self, pages=None, load_text=False):
+        """
+        Load the catalog.
+
+        Args:
+        - pages: Names of the PAGE_COLUMNS pages this catalog serves; only
+          their columns are loaded (default: every page).
+        - load_text: Load HEAVY_TEXT_COLUMNS into orig_df too (default: read
+          them per movie with get_text()).
+        """
+        self.csv_name = 'movies_with_links.csv'
+        columns = page_columns(pages) + (list(HEAVY_TEXT_COLUMNS) if load_text else [])
+        # Heavy text is opened from the same cache build as orig_df, so its rows
+        # match even if the catalog is rebuilt while this MovieDB is in use
+        self.orig_df, self.text_columns = load_catalog(os.getcwd(), self.csv_name, columns,
+                                                       () if load_text else HEAVY_TEXT_COLUMNS)
+        self.version = next(_catalog_versions)
+        self.genre_index = GenreIndex(self.orig_df['genres'])
+        # Only the search page looks up titles
+        self.title_index = TitleIndex(self.orig_df['title']) if 'title' in self.orig_df.columns else None
+        self.language_index = ValueIndex(self.orig_df['original_language'])
+        self.year_index = YearIndex(self.orig_df['release_year'])
+        # Hash table from movie id to catalog row
+        self.id_index = pd.Index(self.orig_df['id'])
+        self.sort_indexes = {}
+        # Only the analysis pages need these; built on first use or by warm_up()
+        self._cube = None
+        self._sep_genre_df = None
+        self._lazy_lock = threading.RLock()
+        self._text_lock = threading.RLock()
+
+    @property
+    def cube(self):
+        """ the AggregateCube of the catalog, built on first use """
+        with self._lazy_lock:
+            if self._cube is None:
+                self._cube = AggregateCube(self)
+            return self._cube
+
+    @property
+    def sep_genre_df(self):
+        """ the whole catalog with genres exploded, built on first use """
+        with self._lazy_lock:
+            if self._sep_genre_df is None:
+                self._sep_genre_df = self.get_separated_genres(self.orig_df)
+            return self._sep_genre_df
+
+    def warm_up(self):
+        """
+        Build what the pages need beyond orig_df: the analysis pages' data
+        first, then the substring search's table.
+
+        Heavy text is left alone: without a cache it means parsing the CSV,
+        and the search page reads it when details are first shown.
+
+        Safe from a background thread (the app runs it on one at startup).
+        """
+        cube, sep_genre_df = self.cube, self.sep_genre_df
+        if self.title_index is not None:
+            self.title_index.prepare()
+        return cube, sep_genre_df
+
+    def load_text_columns(self, columns=HEAVY_TEXT_COLUMNS):
+        """
+        Read the heavy text columns not loaded yet from the CSV.
+
+        Columns are normally opened from the catalog cache with orig_df; this
+        is only needed when there was no cache to open them from. It reads
+        the CSV in one pass, which is slow on a big catalog: the search page
+        calls it from its details worker so the Tk thread never has to.
+        """
+        with self._text_lock:
+            unread = [column for column in columns
+                      if column not in self.orig_df.columns and column not in self.text_columns]
+            if unread:
+                data = pd.read_csv(os.path.join(os.getcwd(), self.csv_name), usecols=unread)
+                for column in unread:
+                    self.text_columns[column] = data[column].to_numpy()
+
+    def text_column(self, column):
+        """
+        Return a heavy text column, indexable by catalog row.
+
+        Read from the cache's offset-indexed blob (a TextColumn) when there is
+        one, so nothing is loaded up front; otherwise the column is read from
+        the CSV once (see load_text_columns()).
+        """
+        if column in self.orig_df.columns:
+            return self.orig_df[column].to_numpy()
+        with self._text_lock:
+            if column not in self.text_columns:
+                self.load_text_columns([column])
+            return self.text_columns[column]
+
+    def get_text(self, movie_id, column):
+        """ return one heavy text value (e.g. 'overview') of the movie with this id; NaN if missing """
+        return self.text_column(column)[self.get_row(movie_id)]
 
     def get_orig_df(self):
-        """ return  orig_df """
-        return self.orig_df
+        """ return a view of orig_df (only safe to assign into with copy-on-write on, see main.py) """
+        return self.orig_df.copy(deep=False)
+
+    def get_row(self, movie_id):
+        """ return the catalog row number of the movie with this id """
+        position = self.id_index.get_loc(movie_id)
+        if not isinstance(position, (int, np.integer)):
+            # Duplicate ids: take the first
+            position = np.arange(len(self.id_index))[position][0]
+        return position
+
+    def get_movie(self, movie_id):
+        """ return the catalog row (Series) of the movie with this id """
+        return self.orig_df.iloc[self.get_row(movie_id)]
+
+    def sort_index(self, column):
+        """ return the SortIndex of a numeric column, building it on first use """
+        if column not in self.sort_indexes:
+            self.sort_indexes[column] = SortIndex(self.orig_df[column])
+        return self.sort_indexes[column]
+
+    def get_genres(self):
+        """ return every genre name in the catalog """
+        return list(self.genre_index.names)
 
     def get_separated_genres(self, df):
-        """ explode genrese column """
-        df.loc[:, 'genres'] = df['genres'].apply(lambda x: eval(x))
-        df_sep_genres = df.explode('genres')
-        df_sep_genres.reset_index(drop=True, inplace=True)
-        return df_sep_genres
+        """ explode genres column of df (the catalog or a row subset of it) """
+        return self.genre_index.explode(df)
 
 
     def get_df_no_zero(self,df):
@@ -48,8 +310,112 @@ class MovieDB:
         df_sep_genre = self.get_separated_genres(df_by_lang)
         return df_by_lang, df_sep_genre
 
+    def language_story(self, lang):
+        """ compute everything the storytelling charts show for one language """
+        return LanguageStory(self, lang)
+
+
+class LanguageStory:
+    """
+    Data behind the storytelling charts for one original language.
+
+    Everything is computed up front, so switching between stories of the
+    same language only has to draw.
+
+    Attributes:
+    - language (str): The original language.
+    - df_by_lang (DataFrame): Movies in that language.
+    - df_sep_genre (DataFrame): The same movies, one row per genre.
+    - statistics (DataFrame): describe() of revenue and budget (moments from
+      the aggregate cube, quartiles from the language's movies).
+    - correlation (DataFrame): Correlation matrix of revenue and budget.
+    - histograms (dict): column -> (counts, bin_edges) with 20 bins.
+    - genre_means (DataFrame): Mean revenue and budget per genre.
+    - year_means (DataFrame): Mean revenue and budget per release year.
+    """
+
+    HISTOGRAM_BINS = 20
+
+    def __init__(self, db, lang):
+        self.language = lang
+        self.df_by_lang, self.df_sep_genre = db.storytelling(db.get_orig_df(), lang)
+        metrics = self.df_by_lang[['revenue', 'budget']]
+        where = {'original_language': lang}
+        summary = db.cube.summary(where, measures=('revenue', 'budget'))
+        quartiles = metrics.quantile([0.25, 0.5, 0.75])
+        quartiles.index = ['25%', '50%', '75%']
+        self.statistics = pd.concat([summary.loc[['count', 'mean', 'std', 'min']], quartiles, summary.loc[['max']]])
+        self.correlation = metrics.corr()
+        self.histograms = {}
+        for column in ('revenue', 'budget'):
+            values = self.df_by_lang[column].dropna().to_numpy()
+            self.histograms[column] = np.histogram(values, bins=self.HISTOGRAM_BINS)
+        means = {'revenue_mean': 'revenue', 'budget_mean': 'budget'}
+        genre_means = db.cube.rollup(['genres'], where, measures=('revenue', 'budget'))
+        self.genre_means = genre_means[['genres'] + list(means)].rename(columns=means)
+        year_means = db.cube.rollup(['release_year'], where, measures=('revenue', 'budget'))
+        self.year_means = year_means[['release_year'] + list(means)].rename(columns=means)
+
+
+
+def get_movie_db():
+    """
+    Return the process-wide MovieDB, loading the catalog on first use.
+
+    Every page should take its data from here (or from a MovieDB passed in)
+    so the CSV is parsed once per process.
+    """
+    global _shared_db
+    if _shared_db is None:
+        _shared_db = MovieDB()
+    return _shared_db
+
+
+def add_reload_listener(callback):
+    """
+    Call callback(db) with the new MovieDB every time reload_movie_db() runs.
+
+    Anything holding on to the shared MovieDB (pages, graphs, chart caches)
+    should register here and swap its db when called.
+    """
+    _reload_listeners.append(callback)
+
+
+def remove_reload_listener(callback):
+    """ stop telling callback about reloads """
+    if callback in _reload_listeners:
+        _reload_listeners.remove(callback)
+
+
+def reload_movie_db(db=None):
+    """
+    Replace the shared MovieDB and tell the reload listeners.
+
+    Listeners are called on the calling thread (the Tk thread in the app).
+
+    Args:
+    - db (MovieDB): The new catalog (default: load it again now).
+
+    Returns:
+    - MovieDB: The new shared MovieDB.
+    """
+    global _shared_db
+    _shared_db = db if db is not None else MovieDB()
+    for callback in list(_reload_listeners):
+        callback(_shared_db)
+    return _shared_db
+
 
+def close_movie_db():
+    """ drop the shared MovieDB and its reload listeners; the next get_movie_db() reloads the catalog """
+    global _shared_db
+    _shared_db = None
+    _reload_listeners.clear()
 
 
 if __name__ == '__main__':
-    movie_db = MovieDB()
+    # Memory of the loaded columns with pandas' default dtypes vs. as MovieDB holds them
+    movie_db = get_movie_db()
+    default_df = csv_loader(os.getcwd(), movie_db.csv_name, list(movie_db.orig_df.columns))
+    with pd.option_context('display.width', 120, 'display.max_columns', None):
+        print(memory_report(default_df, movie_db.orig_df))
@@ -0,0 +1,86 @@
+"""
+This module provides a small least-recently-used cache
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Mapping that keeps at most max_entries items, evicting the least recently used.
+
+    With a weigh function the cache also keeps the total weight of its values
+    (e.g. their size in bytes) within max_weight.
+
+    Attributes:
+    - max_entries (int): How many entries to keep.
+    - max_weight (int): Largest total weight to keep, or None for no limit.
+    - weight (int): Current total weight of the values.
+    """
+
+    def __init__(self, max_entries=8, max_weight=None, weigh=None):
+        """
+        Initialize the cache.
+
+        Args:
+        - max_entries (int): How many entries to keep (at least one).
+        - max_weight (int): Largest total weight to keep (default: no limit).
+        - weigh (callable): weigh(value) -> weight of a value (default: 0).
+        """
+        self.max_entries = max(1, max_entries)
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.weight = 0
+        self._entries = OrderedDict()
+        self._weights = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """ return the value for key (marking it recently used), or default """
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        """
+        Store value under key, evicting the oldest entries if over capacity.
+
+        A value heavier than max_weight on its own is not stored.
+        """
+        weight = self.weigh(value) if self.weigh is not None else 0
+        self.pop(key)
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+        self._entries[key] = value
+        self._weights[key] = weight
+        self.weight += weight
+        while len(self._entries) > self.max_entries or (
+                self.max_weight is not None and self.weight > self.max_weight):
+            self.pop(next(iter(self._entries)))
+
+    def pop(self, key, default=None):
+        """ remove key and return its value, or default """
+        if key not in self._entries:
+            return default
+        self.weight -= self._weights.pop(key)
+        return self._entries.pop(key)
+
+    def get_or_create(self, key, factory):
+        """ return the value for key, calling factory() to create it on a miss """
+        if key in self._entries:
+            return self.get(key)
+        value = factory()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        """ drop every entry """
+        self._entries.clear()
+        self._weights.clear()
+        self.weight = 0
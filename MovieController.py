@@ -1,13 +1,246 @@
 """
 Use to help plot graphs and control UI behavior
+
+Charts are drawn with Agg and never touch Tk, so this module also works
+headless (see export_story and export_graph).
 """
 import matplotlib as plt
+import numpy as np
+import pandas as pd
 import seaborn as sns
-import tkinter as tk
-from Database import MovieDB
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from Database import get_movie_db
+from LRUCache import LRUCache
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.figure import Figure
-plt.use("TkAgg")
+from matplotlib.lines import Line2D
+
+# Scatter plots with more points than this are drawn as a density map instead
+DENSITY_THRESHOLD = 20000
+DENSITY_GRIDSIZE = 60
+
+
+def use_density(count, threshold, exact=False):
+    """ whether a scatter of count points should be drawn as a density map """
+    return not exact and threshold is not None and count > threshold
+
+
+def plot_density(fig, ax, x, y, gridsize=DENSITY_GRIDSIZE, label='Movies'):
+    """
+    Draw a hexbin density map of x against y instead of one marker per point.
+
+    Binning is a single NumPy pass and only the non-empty hexagons are drawn,
+    so the drawing cost depends on gridsize, not on the number of points.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    finite = np.isfinite(x) & np.isfinite(y)
+    hexbin = ax.hexbin(x[finite], y[finite], gridsize=gridsize, mincnt=1, bins='log', cmap='viridis')
+    fig.colorbar(hexbin, ax=ax, label=f'{label} (log scale)')
+    return hexbin
+
+
+class ChartResult:
+    """
+    A chart built off the Tk thread, ready to be shown or saved.
+
+    Which of image, figure and data is set depends on the ChartFigure output.
+
+    Attributes:
+    - text (str): Text to show above the chart, or None.
+    - image (ndarray): The rendered chart as an RGBA array, or None.
+    - dpi (float): Resolution the chart was rendered at.
+    - figure (Figure): The chart itself, or None.
+    - data (bytes): The chart encoded as format, or None.
+    - format (str): File format of data ('png', 'svg' or 'pdf').
+    """
+
+    def __init__(self, text=None, image=None, dpi=100, figure=None, data=None, format=None):
+        self.text = text
+        self.image = image
+        self.dpi = dpi
+        self.figure = figure
+        self.data = data
+        self.format = format
+
+
+def result_size(result):
+    """ approximate number of bytes a ChartResult holds """
+    size = 0
+    if result.image is not None:
+        size += result.image.nbytes
+    if result.data is not None:
+        size += len(result.data)
+    if result.text is not None:
+        size += len(result.text)
+    return size
+
+
+class ChartCache:
+    """
+    Rendered charts kept by the parameters they were built from.
+
+    Keys start with the catalog version and a new version drops every entry,
+    so a reloaded catalog never shows charts from before the reload.
+
+    Attributes:
+    - version (int): Catalog version the entries were built from.
+    - results (LRUCache): ChartResult per key, within a byte budget.
+    """
+    MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, max_bytes=MAX_BYTES, max_entries=64):
+        """
+        Initialize the cache.
+
+        Args:
+        - max_bytes (int): Total size of the charts to keep.
+        - max_entries (int): Most charts to keep.
+        """
+        self.version = None
+        self.results = LRUCache(max_entries, max_weight=max_bytes, weigh=result_size)
+
+    def key(self, db, *params):
+        """ cache key of a chart built from params over db """
+        if db.version != self.version:
+            self.results.clear()
+            self.version = db.version
+        return (db.version,) + tuple(tuple(param) if isinstance(param, list) else param for param in params)
+
+    def clear(self):
+        """ drop every chart """
+        self.results.clear()
+        self.version = None
+
+    def get(self, key):
+        """ return the cached ChartResult for key, or None """
+        return self.results.get(key)
+
+    def put(self, key, result):
+        """ keep result under key """
+        self.results.put(key, result)
+
+
+class ChartFigure:
+    """
+    One off-screen figure reused for every chart a graph class draws.
+
+    new() clears the previous chart's artists before handing the figure out
+    again and render() clears them once the chart is copied out, so drawing
+    more charts does not grow memory.
+
+    Attributes:
+    - output (str): What render() returns: 'image' (RGBA pixels), 'figure'
+      (a new Figure per chart, left to the caller) or 'png'/'svg'/'pdf' bytes.
+    - figure (Figure): The figure charts are drawn on.
+    - canvas (FigureCanvasAgg): The Agg canvas rendering the figure.
+    """
+    OUTPUTS = ('image', 'figure', 'png', 'svg', 'pdf')
+
+    def __init__(self, output='image'):
+        if output not in self.OUTPUTS:
+            raise ValueError(f'Unknown chart output {output!r}, expected one of {self.OUTPUTS}')
+        self.output = output
+        self.figure = Figure()
+        self.canvas = FigureCanvasAgg(self.figure)
+
+    def new(self, figsize):
+        """
+        Return the cleared figure, resized to figsize inches.
+        """
+        if self.output == 'figure':
+            # The previous figure belongs to the caller now
+            self.figure = Figure()
+            self.canvas = FigureCanvasAgg(self.figure)
+        self.figure.clear()
+        self.figure.set_size_inches(*figsize)
+        return self.figure
+
+    def render(self):
+        """
+        Render the figure and release its artists.
+
+        Returns:
+        - ChartResult: The chart in the form asked for by output.
+        """
+        if self.output == 'figure':
+            return ChartResult(figure=self.figure, dpi=self.figure.dpi)
+        if self.output == 'image':
+            self.canvas.draw()
+            result = ChartResult(image=np.asarray(self.canvas.buffer_rgba()).copy(), dpi=self.figure.dpi)
+        else:
+            buffer = BytesIO()
+            self.figure.savefig(buffer, format=self.output)
+            result = ChartResult(data=buffer.getvalue(), dpi=self.figure.dpi, format=self.output)
+        self.figure.clear()
+        return result
+
+
+class ChartWorker:
+    """
+    Runs chart jobs on a background thread and hands results back to Tk.
+
+    Only the latest job matters: submitting a new one cancels the previous job
+    if it has not started yet and discards its result if it has.
+
+    Attributes:
+    - widget (Widget): Tk widget used to poll for results with after().
+    - generation (int): Number of the latest submitted job.
+    """
+    POLL_MS = 30
+
+    def __init__(self, widget):
+        """
+        Initialize the worker.
+
+        Args:
+        - widget (Widget): Any Tk widget of the page using the worker.
+        """
+        self.widget = widget
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.generation = 0
+        self.future = None
+
+    @property
+    def busy(self):
+        """ whether a job is queued or running """
+        return self.future is not None
+
+    def submit(self, job, on_done, on_error=None):
+        """
+        Run job() in the background and call on_done(result) on the Tk thread.
+
+        Args:
+        - job (callable): Work to do; must not touch Tk.
+        - on_done (callable): Called with job's return value.
+        - on_error (callable): Called with the exception if job fails (default: re-raise on the Tk thread).
+        """
+        self.cancel()
+        self.future = self.executor.submit(job)
+        self.widget.after(self.POLL_MS, self._poll, self.future, self.generation, on_done, on_error)
+
+    def cancel(self):
+        """ forget the current job; its result will never be delivered """
+        self.generation += 1
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+
+    def _poll(self, future, generation, on_done, on_error):
+        if generation != self.generation:
+            return
+        if not future.done():
+            self.widget.after(self.POLL_MS, self._poll, future, generation, on_done, on_error)
+            return
+        self.future = None
+        error = future.exception()
+        if error is None:
+            on_done(future.result())
+        elif on_error is not None:
+            on_error(error)
+        else:
+            raise error
 
 
 class StorytellingGraph:
@@ -15,31 +248,54 @@ class StorytellingGraph:
     Class for creating storytelling graphs.
 
     Attributes:
-    - db (MovieDB): An instance of the MovieDB class for database interaction.
+    - db (MovieDB): The shared MovieDB catalog.
     - df (DataFrame): The original DataFrame containing movie data.
     - _selected_language (str): The selected language for analysis.
+    - story (LanguageStory): Precomputed data for the selected language.
+    - story_cache (LRUCache): LanguageStory per recently selected language.
+    - density_threshold (int): Point count above which scatter plots become density maps.
+    - figure (ChartFigure): The figure every story is drawn on.
     - parent (Tk): The parent Tkinter window.
 
     Methods:
     - selected_language (property): Getter and setter for the selected_language attribute.
-    - get_descriptive_stats(root): Generate and display descriptive statistics for the selected language.
-    - get_correlation(root): Generate and display correlation matrix and scatter plot.
-    - get_histogram(root): Generate and display histograms of revenue and budget.
-    - get_bar_graph(root): Generate and display a bar graph of average revenue and budget by genre.
-    - get_trend(root): Generate and display a line graph of average revenue trend over the years.
+    - get_story(language, story, exact=False, confidence=False): Build one of STORIES for a language.
+    - get_descriptive_stats(): Descriptive statistics for the selected language.
+    - get_correlation(exact=False): Correlation matrix and scatter plot.
+    - get_histogram(): Histograms of revenue and budget.
+    - get_bar_graph(confidence=False): Bar graph of average revenue and budget by genre.
+    - get_trend(): Line graph of average revenue trend over the years.
+
+    Every chart is returned as a ChartResult and none of them touch Tk, so
+    they can run on a ChartWorker.
     """
-
-    def __init__(self, parent):
+    STORIES = {
+        'Descriptive statistics of revenue and budget': 'get_descriptive_stats',
+        'Correlation of revenue and budget': 'get_correlation',
+        'Histogram of revenue and budget': 'get_histogram',
+        'Bar graph of avg revenue and budget by genre': 'get_bar_graph',
+        'Trend of revenue over the years': 'get_trend',
+    }
+
+    def __init__(self, parent=None, db=None, cache_size=8, density_threshold=DENSITY_THRESHOLD, output='image'):
         """
         Initialize the StorytellingGraph class.
 
         Args:
-        - parent (Tk): The parent Tkinter window.
+        - parent (Tk): The parent Tkinter window (None when headless).
+        - db (MovieDB): The catalog to read from (defaults to the shared one).
+        - cache_size (int): How many languages to keep precomputed data for.
+        - density_threshold (int): Scatter plots with more points are drawn as a density map (None: never).
+        - output (str): What charts are returned as (see ChartFigure.output).
         """
         super().__init__()
-        self.db = MovieDB()
+        self.db = db if db is not None else get_movie_db()
         self.df = self.db.get_orig_df()
         self._selected_language = None
+        self.story = None
+        self.story_cache = LRUCache(cache_size)
+        self.density_threshold = density_threshold
+        self.figure = ChartFigure(output)
         self.parent = parent
 
     @property
@@ -61,19 +317,37 @@ class StorytellingGraph:
         - new_lang (str): The new selected language for analysis.
         """
         self._selected_language = new_lang
-        self.df_by_lang, self.df_sep_genre = self.db.storytelling(self.df, self._selected_language)
+        self.story = self.story_cache.get_or_create(new_lang, lambda: self.db.language_story(new_lang))
+        self.df_by_lang, self.df_sep_genre = self.story.df_by_lang, self.story.df_sep_genre
 
-    def get_descriptive_stats(self, root):
+    def get_story(self, language, story, exact=False, confidence=False):
         """
-        Generate and display descriptive statistics for the selected language.
+        Build a story for a language.
 
         Args:
-        - root (Tk): The root Tkinter window.
+        - language (str): The original language.
+        - story (str): One of the STORIES names.
+        - exact (bool): Draw every point of scatter plots, however many there are.
+        - confidence (bool): Show 95% confidence intervals on bar graphs.
 
         Returns:
-        - Text: A Text widget containing the formatted descriptive statistics.
+        - ChartResult: The story's text and/or chart.
+        """
+        self.selected_language = language
+        if self.STORIES[story] == 'get_correlation':
+            return self.get_correlation(exact)
+        if self.STORIES[story] == 'get_bar_graph':
+            return self.get_bar_graph(confidence)
+        return getattr(self, self.STORIES[story])()
+
+    def get_descriptive_stats(self):
         """
-        statistics = self.df_by_lang[['budget', 'revenue']].describe()
+        Generate descriptive statistics for the selected language.
+
+        Returns:
+        - ChartResult: The formatted descriptive statistics as text.
+        """
+        statistics = self.story.statistics
 
         # Format the descriptive statistics for better readability
         formatted_stats = statistics.round(2)
@@ -81,28 +355,20 @@ class StorytellingGraph:
         formatted_stats.columns = ['Revenue', 'Budget']
 
         # Convert the DataFrame to a formatted string
-        formatted_string = formatted_stats.to_string()
+        return ChartResult(text=formatted_stats.to_string())
 
-        # Create a text widget to display the formatted descriptive statistics
-        text_widget = tk.Text(root, height=10, width=50, font=('Arial', 14))
-        text_widget.insert(tk.END, formatted_string)
-        text_widget['state'] = 'disabled'
-        return text_widget
-
-    def get_correlation(self, root):
+    def get_correlation(self, exact=False):
         """
-        Generate and display correlation matrix and scatter plot.
+        Generate correlation matrix and scatter plot.
 
         Args:
-        - root (Tk): The root Tkinter window.
+        - exact (bool): Draw every movie even above density_threshold.
 
         Returns:
-        - Frame: A Frame widget containing the correlation matrix and scatter plot.
+        - ChartResult: The correlation matrix as text and the scatter plot.
         """
-        frame = tk.Frame(root)
-
-        # Calculate correlation matrix
-        statistics = self.df_by_lang[['budget', 'revenue']].corr()
+        # Correlation matrix
+        statistics = self.story.correlation
 
         # Format the descriptive statistics for better readability
         formatted_stats = statistics.round(2)
@@ -110,47 +376,39 @@ class StorytellingGraph:
         formatted_stats.columns = ['Revenue', 'Budget']
         formatted_string = formatted_stats.to_string()
 
-        # Create a text widget for displaying the correlation matrix
-        text_widget = tk.Text(frame, height=4, width=50, font=('Arial', 14))
-        text_widget.insert(tk.END, formatted_string)
-        text_widget['state'] = 'disabled'
-        text_widget.pack()
-
         # Create a figure and subplot for the scatter plot
-        fig = Figure(figsize=(10, 6))
+        fig = self.figure.new((10, 6))
         ax = fig.add_subplot(111)
 
-        # Plot the scatter plot on the subplot
-        sns.scatterplot(x='budget', y='revenue', data=self.df_by_lang, ax=ax)
-        ax.set_title('Scatter Plot of Revenue vs Budget')
+        # Plot the scatter plot on the subplot, or its density for large languages
+        if use_density(len(self.df_by_lang), self.density_threshold, exact):
+            plot_density(fig, ax, self.df_by_lang['budget'], self.df_by_lang['revenue'])
+            ax.set_title('Density of Revenue vs Budget')
+        else:
+            sns.scatterplot(x='budget', y='revenue', data=self.df_by_lang, ax=ax)
+            ax.set_title('Scatter Plot of Revenue vs Budget')
         ax.set_xlabel('Budget')
         ax.set_ylabel('Revenue')
         ax.grid(True)
 
-        # Create a canvas widget for displaying the scatter plot
-        canvas = FigureCanvasTkAgg(fig, master=frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
-
-        # Return the frame containing the correlation matrix and scatter plot
-        return frame
+        # Render the scatter plot below the correlation matrix
+        result = self.figure.render()
+        result.text = formatted_string
+        return result
 
-    def get_histogram(self, root):
+    def get_histogram(self):
         """
-        Generate and display histograms of revenue and budget.
-
-        Args:
-        - root (Tk): The root Tkinter window.
+        Generate histograms of revenue and budget.
 
         Returns:
-        - Frame: A Frame widget containing the histograms.
+        - ChartResult: The rendered histograms.
         """
-        frame = tk.Frame(root)
-        fig = Figure(figsize=(10, 6))
+        fig = self.figure.new((10, 6))
 
         # Add first subplot for the revenue histogram
         ax1 = fig.add_subplot(121)
-        sns.histplot(self.df_by_lang['revenue'], bins=20, color='skyblue', edgecolor='black', ax=ax1)
+        counts, edges = self.story.histograms['revenue']
+        ax1.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color='skyblue', edgecolor='black')
         ax1.set_title('Histogram of Revenue')
         ax1.set_xlabel('Revenue')
         ax1.set_ylabel('Frequency')
@@ -158,40 +416,42 @@ class StorytellingGraph:
 
         # Add second subplot for the budget histogram
         ax2 = fig.add_subplot(122)
-        sns.histplot(self.df_by_lang['budget'], bins=20, color='salmon', edgecolor='black', ax=ax2)
+        counts, edges = self.story.histograms['budget']
+        ax2.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color='salmon', edgecolor='black')
         ax2.set_title('Histogram of Budget')
         ax2.set_xlabel('Budget')
         ax2.set_ylabel('Frequency')
         ax2.grid(True)
 
-        # Create a canvas widget for displaying the plots
-        canvas = FigureCanvasTkAgg(fig, master=frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+        return self.figure.render()
 
-        # Return the frame containing the plots
-        return frame
-
-    def get_bar_graph(self, root):
+    def get_bar_graph(self, confidence=False):
         """
-        Generate and display a bar graph of average revenue and budget by genre.
+        Generate a bar graph of average revenue and budget by genre.
 
         Args:
-        - root (Tk): The root Tkinter window.
+        - confidence (bool): Let seaborn bootstrap 95% confidence intervals
+          from every movie (slow) instead of drawing the precomputed means.
 
         Returns:
-        - Frame: A Frame widget containing the bar graph.
+        - ChartResult: The rendered bar graph.
         """
-        frame = tk.Frame(root)
-        fig = Figure(figsize=(12, 6))  # Increase the width of the figure
+        fig = self.figure.new((12, 6))  # Increase the width of the figure
         ax = fig.add_subplot(111)
 
-        # Group by genre and calculate average metrics
-        avg_metrics_by_genre = self.df_sep_genre.groupby('genres')[['revenue', 'budget']].mean().reset_index()
-
-        # Plot bar chart
-        sns.barplot(x='genres', y='revenue', data=avg_metrics_by_genre, color='skyblue', ax=ax, label='Revenue')
-        sns.barplot(x='genres', y='budget', data=avg_metrics_by_genre, color='salmon', ax=ax, label='Budget')
+        if confidence:
+            data = self.df_sep_genre.dropna(subset=['genres'])
+            sns.barplot(x='genres', y='revenue', data=data, color='skyblue', ax=ax, label='Revenue',
+                        errorbar=('ci', 95))
+            sns.barplot(x='genres', y='budget', data=data, color='salmon', ax=ax, label='Budget',
+                        errorbar=('ci', 95))
+        else:
+            # Average metrics by genre
+            avg_metrics_by_genre = self.story.genre_means
+            positions = np.arange(len(avg_metrics_by_genre))
+            ax.bar(positions, avg_metrics_by_genre['revenue'], color='skyblue', label='Revenue')
+            ax.bar(positions, avg_metrics_by_genre['budget'], color='salmon', label='Budget')
+            ax.set_xticks(positions, avg_metrics_by_genre['genres'])
 
         if len(ax.get_xticks()) > 9:
             ax.tick_params(axis='x', rotation=30, labelsize=8)
@@ -203,46 +463,29 @@ class StorytellingGraph:
         # Add legend
         ax.legend()
 
-        # Create a canvas widget for displaying the plot
-        canvas = FigureCanvasTkAgg(fig, master=frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+        return self.figure.render()
 
-        # Return the frame containing the plot
-        return frame
-
-    def get_trend(self, root):
+    def get_trend(self):
         """
-        Generate and display a line graph of average revenue trend over the years.
-
-        Args:
-        - root (Tk): The root Tkinter window.
+        Generate a line graph of average revenue trend over the years.
 
         Returns:
-        - Frame: A Frame widget containing the line graph.
+        - ChartResult: The rendered line graph.
         """
-        frame = tk.Frame(root)
         # Create a new figure
-        fig = Figure(figsize=(10, 6))
+        fig = self.figure.new((10, 6))
         ax = fig.add_subplot(111)
 
-        # self.df_by_lang.loc[:, 'year'] = self.df_by_lang['release_date'].dt.year
-
-        # Plot line plot
-        sns.lineplot(x='release_year', y='revenue', data=self.df_by_lang, color='skyblue', ax=ax)
+        # Plot line plot of the yearly means
+        year_means = self.story.year_means
+        ax.plot(year_means['release_year'], year_means['revenue'], color='skyblue')
         ax.set_xlabel('Year')
         ax.set_ylabel('Average Revenue')
         ax.set_title('Average Revenue Trend Over the Years')
         ax.grid(True)
         fig.tight_layout()
 
-        # Create a canvas widget for displaying the plot
-        canvas = FigureCanvasTkAgg(fig, master=frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
-
-        # Return the canvas
-        return frame
+        return self.figure.render()
 
 
 class ExplorationGraph:
@@ -250,92 +493,123 @@ class ExplorationGraph:
     Class for creating exploration graphs.
 
     Attributes:
-    - db (MovieDB): An instance of the MovieDB class for database interaction.
+    - db (MovieDB): The shared MovieDB catalog.
     - df (DataFrame): The original DataFrame containing movie data.
     - df_sep_genres (DataFrame): The DataFrame with genres separated for analysis.
+    - genre_codes (ndarray): Position in genre_names of each df_sep_genres row's genre.
+    - genre_names (Index): The genres of df_sep_genres, in order of first appearance.
+    - density_threshold (int): Point count above which scatter plots become density maps.
+    - figure (ChartFigure): The figure every plot is drawn on.
     - parent (Tk): The parent Tkinter window.
 
     Methods:
-    - group_data(x_attribute, x_sub_var, y_attribute): Group the data based on the selected attributes.
-    - plot_bar_graph(root, x_attribute, x_sub_var, y_attribute): Generate and display a bar graph.
-    - plot_line_plot(root, x_attribute, x_sub_var, y_attribute): Generate and display a line graph.
-    - plot_scatter_plot(root, x_attribute, y_attribute, transparency=0.5): Generate and display a scatter plot.
+    - aggregate(x_attribute, x_sub_var, y_attribute, by_year=False): Averages rolled up from the aggregate cube.
+    - bar_rows(x_attribute, x_sub_var): The movies a bar graph averages over.
+    - plot_bar_graph(x_attribute, x_sub_var, y_attribute, confidence=False): Generate a bar graph.
+    - plot_line_plot(x_attribute, x_sub_var, y_attribute): Generate a line graph.
+    - plot_scatter_plot(x_attribute, y_attribute, transparency=0.5, exact=False): Generate a scatter plot.
+
+    The plots are returned as ChartResults and do not touch Tk, so they can
+    run on a ChartWorker.
     """
-    def __init__(self, parent):
+    def __init__(self, parent=None, db=None, density_threshold=DENSITY_THRESHOLD, output='image'):
         """
         Initialize the ExplorationGraph class.
 
         Args:
-        - parent (Tk): The parent Tkinter window.
+        - parent (Tk): The parent Tkinter window (None when headless).
+        - db (MovieDB): The catalog to read from (defaults to the shared one).
+        - density_threshold (int): Scatter plots with more points are drawn as a density map (None: never).
+        - output (str): What charts are returned as (see ChartFigure.output).
         """
         super().__init__()
-        self.db = MovieDB()
+        self.db = db if db is not None else get_movie_db()
         self.df = self.db.get_orig_df()
-        self.df_sep_genres = self.db.get_separated_genres(self.df)
+        self.df_sep_genres = self.db.sep_genre_df
+        # Genre code of every exploded row, in order of first appearance
+        self.genre_codes, self.genre_names = pd.factorize(self.df_sep_genres['genres'], use_na_sentinel=False)
+        self.density_threshold = density_threshold
+        self.figure = ChartFigure(output)
         self.parent = parent
 
-    def group_data(self, x_attribute, x_sub_var, y_attribute):
+    def aggregate(self, x_attribute, x_sub_var, y_attribute, by_year=False):
         """
-        Groups the data based on the specified attributes.
+        Average y_attribute per x_attribute value, rolled up from the aggregate cube.
 
         Args:
         - x_attribute: The attribute to group by.
-        - x_sub_var: The sub-attribute value(s) for further filtering.
-        - y_attribute: The attribute for which to calculate the mean.
+        - x_sub_var: The sub-attribute value(s) to keep (all when empty).
+        - y_attribute: The attribute to average.
+        - by_year: Group by genre and release year instead (for line plots).
 
         Returns:
-        - grouped_data: The grouped DataFrame.
-        """
-        if x_attribute == 'genres' and isinstance(x_sub_var, list) and len(x_sub_var) > 0:
-            # Filter the dataframe to include only the selected genres
-            grouped_data = self.df_sep_genres[self.df_sep_genres['genres'].isin(x_sub_var)]
-        elif x_attribute == 'genres' and isinstance(x_sub_var, str):
-            # Filter the dataframe to include only the selected genre
-            grouped_data = self.df_sep_genres[self.df_sep_genres['genres'] == x_sub_var]
-        elif x_attribute == 'genres':
-            # Plot all genres
-            grouped_data = self.df_sep_genres
-        elif x_attribute == 'original_language' and isinstance(x_sub_var, list) and len(x_sub_var) > 0:
-            # Filter the dataframe to include only the selected original languages
-            grouped_data = self.df_sep_genres[self.df_sep_genres['original_language'].isin(x_sub_var)]
-        elif x_attribute == 'original_language' and isinstance(x_sub_var, str):
-            # Filter the dataframe to include only the selected original language
-            grouped_data = self.df_sep_genres[self.df_sep_genres['original_language'] == x_sub_var]
-        elif x_attribute == 'release_year' and isinstance(x_sub_var, list) and len(x_sub_var) > 0:
-            # Convert list elements to integers
-            x_sub_var = [int(year) for year in x_sub_var]
-            # Filter the dataframe to include only the selected years
-            grouped_data = self.df[self.df['release_year'].isin(x_sub_var)]
-        elif x_attribute == 'release_year' and isinstance(x_sub_var, str):
-            # Filter the dataframe to include only the selected year
-            grouped_data = self.df[self.df['release_year'] == int(x_sub_var)]
-        else:
-            # Group by the x_attribute and calculate the mean of the y_attribute
-            grouped_data = self.df.groupby(x_attribute)[y_attribute].mean().reset_index()
+        - DataFrame: The grouping column(s) and the mean as y_attribute.
+        """
+        if isinstance(x_sub_var, str):
+            x_sub_var = [x_sub_var]
+        where = {}
+        if x_sub_var:
+            if x_attribute == 'release_year':
+                x_sub_var = [int(year) for year in x_sub_var]
+            where[x_attribute] = list(x_sub_var)
+        by = ['genres', 'release_year'] if by_year else [x_attribute]
+
+        rolled = self.db.cube.rollup(by, where, measures=(y_attribute,))
+        return rolled[by + [f'{y_attribute}_mean']].rename(columns={f'{y_attribute}_mean': y_attribute})
+
+    def bar_rows(self, x_attribute, x_sub_var):
+        """
+        The movies a bar graph averages over, as rows of df or df_sep_genres.
 
-        return grouped_data
+        Like the cube, genre bars count a movie once per genre and language or
+        year bars count every movie once.
 
-    def plot_bar_graph(self, root, x_attribute, x_sub_var, y_attribute):
+        Args:
+        - x_attribute: The attribute for the x-axis.
+        - x_sub_var: The sub-attribute value(s) to keep (all when empty).
+
+        Returns:
+        - DataFrame: The matching rows.
+        """
+        if isinstance(x_sub_var, str):
+            x_sub_var = [x_sub_var]
+        if x_attribute == 'genres':
+            rows = self.df_sep_genres
+            return rows[rows['genres'].isin(x_sub_var)] if x_sub_var else rows
+        if not x_sub_var:
+            return self.df
+        if x_attribute == 'release_year':
+            return self.df.iloc[self.db.year_index.rows_in([int(year) for year in x_sub_var])]
+        return self.df[self.df[x_attribute].isin(x_sub_var)]
+
+    def plot_bar_graph(self, x_attribute, x_sub_var, y_attribute, confidence=False):
         """
         Plots a bar graph based on the grouped data.
 
         Args:
-        - root: The root Tkinter widget.
         - x_attribute: The attribute for the x-axis.
         - x_sub_var: The sub-attribute value(s) for further filtering.
         - y_attribute: The attribute for the y-axis.
+        - confidence: Let seaborn bootstrap 95% confidence intervals from every
+          movie (slow) instead of drawing the cube's means (default is False).
 
         Returns:
-        - canvas_widget: The canvas widget containing the bar graph.
+        - ChartResult: The rendered bar graph.
         """
         # Create a new figure
-        fig = Figure(figsize=(10, 6))
+        fig = self.figure.new((10, 6))
         ax = fig.add_subplot(111)
-        grouped_data = self.group_data(x_attribute, x_sub_var, y_attribute)
-
 
         # Plot the bar graph
-        sns.barplot(x=x_attribute, y=y_attribute, data=grouped_data, ax=ax)
+        grouped_data = self.aggregate(x_attribute, x_sub_var, y_attribute)
+        if confidence:
+            # Same bars in the same order as the cube's means, only with error bars
+            sns.barplot(x=x_attribute, y=y_attribute, data=self.bar_rows(x_attribute, x_sub_var), ax=ax,
+                        order=grouped_data[x_attribute].tolist(), errorbar=('ci', 95))
+        else:
+            positions = np.arange(len(grouped_data))
+            ax.bar(positions, grouped_data[y_attribute])
+            ax.set_xticks(positions, grouped_data[x_attribute])
         ax.set_xlabel(x_attribute.capitalize())
         ax.set_ylabel(y_attribute.capitalize())
         ax.set_title(f'Average {y_attribute.capitalize()} by {x_attribute.capitalize()}')
@@ -345,32 +619,26 @@ class ExplorationGraph:
         if len(ax.get_xticks()) > 9:
             ax.tick_params(axis='x', rotation=30, labelsize=8)
 
-        # Create a canvas widget for displaying the plot
-        canvas = FigureCanvasTkAgg(fig, master=root)
-        canvas.draw()
-        canvas_widget = canvas.get_tk_widget()
+        return self.figure.render()
 
-        return canvas_widget
-
-    def plot_line_plot(self, root, x_attribute, x_sub_var, y_attribute):
+    def plot_line_plot(self, x_attribute, x_sub_var, y_attribute):
         """
         Plots a line plot based on the grouped data.
 
         Args:
-        - root: The root Tkinter widget.
         - x_attribute: The attribute for the x-axis.
         - x_sub_var: The sub-attribute value(s) for further filtering.
         - y_attribute: The attribute for the y-axis.
 
         Returns:
-        - canvas_widget: The canvas widget containing the line plot.
+        - ChartResult: The rendered line plot.
         """
         # Create a new figure
-        fig = Figure(figsize=(10, 6))
+        fig = self.figure.new((10, 6))
         ax = fig.add_subplot(111)
 
-        # Group the data based on the x_attribute and x_sub_var
-        grouped_data = self.group_data(x_attribute, x_sub_var, y_attribute)
+        # Yearly averages per genre for the selected x_sub_var
+        grouped_data = self.aggregate(x_attribute, x_sub_var, y_attribute, by_year=True)
 
         # Plot the line plot
         sns.lineplot(x='release_year', y=y_attribute, hue='genres', palette='tab10', data=grouped_data, ax=ax)
@@ -381,47 +649,101 @@ class ExplorationGraph:
         if len(ax.get_xticks()) > 9:
             ax.tick_params(axis='x', rotation=30, labelsize=8)
 
-        # Create a canvas widget for displaying the plot
-        canvas = FigureCanvasTkAgg(fig, master=root)
-        canvas.draw()
-        canvas_widget = canvas.get_tk_widget()
-
-        return canvas_widget
+        return self.figure.render()
 
-    def plot_scatter_plot(self, root, x_attribute, y_attribute, transparency=0.5):
+    def plot_scatter_plot(self, x_attribute, y_attribute, transparency=0.5, exact=False):
         """
         Plots a scatter plot based on the data.
 
+        When there would be more than density_threshold markers (one per movie
+        and genre) the plot shows how many movies fall in each hexagon instead.
+
         Args:
-        - root: The root Tkinter widget.
         - x_attribute: The attribute for the x-axis.
         - y_attribute: The attribute for the y-axis.
         - transparency: The transparency level of the scatter plot markers (default is 0.5).
+        - exact: Draw every point even above density_threshold (default is False).
 
         Returns:
-        - canvas_widget: The canvas widget containing the scatter plot.
+        - ChartResult: The rendered scatter plot.
         """
         # Create a new figure
-        fig = Figure(figsize=(12, 8))  # Increase the figure size for better readability
+        fig = self.figure.new((12, 8))  # Increase the figure size for better readability
         ax = fig.add_subplot(111)
 
-        # Plot each genre separately with a different color
-        genres = self.df_sep_genres['genres'].unique()
-        colors = plt.cm.tab20.colors  # Get a list of colors from the 'tab20' colormap
-        for i, genre in enumerate(genres):
-            genre_df = self.df_sep_genres[self.df_sep_genres['genres'] == genre]
-            ax.scatter(genre_df[x_attribute], genre_df[y_attribute], label=genre, alpha=transparency,
-                       color=colors[i % len(colors)])
+        # One point per movie and known genre would be drawn
+        known = ~pd.isna(self.genre_names)
+        if use_density(int(known[self.genre_codes].sum()), self.density_threshold, exact):
+            # Count each movie once, not once per genre
+            plot_density(fig, ax, self.df[x_attribute], self.df[y_attribute])
+            ax.set_xlabel(x_attribute.capitalize())
+            ax.set_ylabel(y_attribute.capitalize())
+            ax.set_title(f'Density of {y_attribute.capitalize()} vs {x_attribute.capitalize()}')
+            ax.grid(True)
+            return self.figure.render()
+
+        # Color every point by its genre and draw them all as one collection.
+        # Points are grouped by genre so later genres are drawn on top, as
+        # they would be with one scatter call per genre.
+        colors = np.array(plt.cm.tab20.colors)  # Get a list of colors from the 'tab20' colormap
+        order = np.argsort(self.genre_codes, kind='stable')
+        order = order[known[self.genre_codes[order]]]
+        codes = self.genre_codes[order]
+        ax.scatter(self.df_sep_genres[x_attribute].to_numpy()[order], self.df_sep_genres[y_attribute].to_numpy()[order],
+                   c=colors[codes % len(colors)], alpha=transparency)
+
+        # One legend entry per genre, built without drawing anything
+        handles = [Line2D([], [], linestyle='', marker='o', markersize=plt.rcParams['lines.markersize'],
+                          color=colors[i % len(colors)], alpha=transparency, label=genre)
+                   for i, genre in enumerate(self.genre_names) if known[i]]
 
         ax.set_xlabel(x_attribute.capitalize())
         ax.set_ylabel(y_attribute.capitalize())
         ax.set_title(f'Scatter Plot of {y_attribute.capitalize()} vs {x_attribute.capitalize()}')
-        ax.legend(title='Genre', bbox_to_anchor=(1, 1), loc='upper left')  # Adjust legend position
+        ax.legend(handles=handles, title='Genre', bbox_to_anchor=(1, 1), loc='upper left')  # Adjust legend position
         ax.grid(True)
 
-        # Create a canvas widget for displaying the plot
-        canvas = FigureCanvasTkAgg(fig, master=root)
-        canvas.draw()
-        canvas_widget = canvas.get_tk_widget()
+        return self.figure.render()
+
+
+def export_story(language, story, output='png', db=None, **options):
+    """
+    Build a storytelling chart without Tk.
+
+    Args:
+    - language (str): The original language.
+    - story (str): One of StorytellingGraph.STORIES.
+    - output (str): 'figure', 'png', 'svg', 'pdf' or 'image'.
+    - db (MovieDB): The catalog (defaults to the shared one).
+    - options: exact/confidence, as for StorytellingGraph.get_story.
+
+    Returns:
+    - ChartResult: The story's text and/or chart.
+    """
+    return StorytellingGraph(db=db, output=output).get_story(language, story, **options)
 
-        return canvas_widget
+
+def export_graph(graph, x_attribute, y_attribute, x_sub_var=(), output='png', db=None, **options):
+    """
+    Build an exploration graph without Tk.
+
+    Args:
+    - graph (str): 'bar', 'line' or 'scatter'.
+    - x_attribute (str): The attribute for the x-axis.
+    - y_attribute (str): The attribute for the y-axis.
+    - x_sub_var (list): Sub-values to keep (bar and line graphs only).
+    - output (str): 'figure', 'png', 'svg', 'pdf' or 'image'.
+    - db (MovieDB): The catalog (defaults to the shared one).
+    - options: Extra arguments of the plot method (e.g. confidence, exact).
+
+    Returns:
+    - ChartResult: The rendered graph.
+    """
+    explorer = ExplorationGraph(db=db, output=output)
+    if graph == 'bar':
+        return explorer.plot_bar_graph(x_attribute, list(x_sub_var), y_attribute, **options)
+    if graph == 'line':
+        return explorer.plot_line_plot(x_attribute, list(x_sub_var), y_attribute)
+    if graph == 'scatter':
+        return explorer.plot_scatter_plot(x_attribute, y_attribute, **options)
+    raise ValueError(f'Unknown graph {graph!r}, expected bar, line or scatter')
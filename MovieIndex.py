@@ -0,0 +1,554 @@
+"""
+This module holds the lookup structures built over the catalog at load time
+"""
+
+import ast
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+def parse_genres(text):
+    """
+    Parse one stringified genre list such as "['Action', 'Drama']".
+
+    Uses ast.literal_eval, so a hostile CSV cannot run code. Anything that is
+    not a list of strings counts as no genres.
+    """
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return []
+    if not isinstance(value, (list, tuple)):
+        return []
+    return [str(genre) for genre in value]
+
+
+class GenreIndex:
+    """
+    Genres of every catalog row, parsed once.
+
+    The genres of row i are codes[offsets[i]:offsets[i + 1]], and
+    names[code] is the genre name.
+
+    Attributes:
+    - names (list): Genre names in order of first appearance.
+    - codes (ndarray): Genre codes of all rows, concatenated.
+    - offsets (ndarray): Start of each row's genres in codes (length rows + 1).
+    - lengths (ndarray): Number of genres per row.
+    - matrix (ndarray): Boolean rows × genres membership matrix.
+    - bits (ndarray): Per-row uint64 genre bitmask (None with more than 64 genres).
+    - genre_texts (Index): Distinct raw genre strings of the catalog.
+    - row_keys (ndarray): Position in genre_texts of each row's string (-1 if missing).
+    """
+
+    MATCH_MODES = ('any', 'all', 'none')
+
+    def __init__(self, genres):
+        """
+        Build the index.
+
+        Args:
+        - genres (Series): The raw 'genres' column of the catalog.
+        """
+        # Only distinct strings are parsed; most rows share a genre combination
+        row_keys, uniques = pd.factorize(genres)
+        self.row_keys = row_keys.astype(np.int32)
+        self.genre_texts = pd.Index(np.asarray(uniques, dtype=object))
+        self.names = []
+        self.positions = positions = {}
+        unique_codes = []
+        for text in uniques:
+            codes = []
+            for genre in parse_genres(text):
+                if genre not in positions:
+                    positions[genre] = len(self.names)
+                    self.names.append(genre)
+                codes.append(positions[genre])
+            unique_codes.append(codes)
+
+        unique_lengths = np.array([len(codes) for codes in unique_codes] + [0], dtype=np.int64)
+        unique_offsets = np.zeros(len(unique_lengths), dtype=np.int64)
+        np.cumsum(unique_lengths[:-1], out=unique_offsets[1:])
+        flat_unique_codes = np.array([code for codes in unique_codes for code in codes], dtype=np.int16)
+
+        # Missing values factorize to -1, which picks the trailing empty entry
+        self.lengths = unique_lengths[row_keys]
+        self.offsets = np.zeros(len(row_keys) + 1, dtype=np.int64)
+        np.cumsum(self.lengths, out=self.offsets[1:])
+        within = np.arange(self.offsets[-1]) - np.repeat(self.offsets[:-1], self.lengths)
+        self.codes = flat_unique_codes[np.repeat(unique_offsets[row_keys], self.lengths) + within]
+
+        self.matrix = np.zeros((len(row_keys), len(self.names)), dtype=bool)
+        self.matrix[np.repeat(np.arange(len(row_keys)), self.lengths), self.codes] = True
+
+        self.bits = None
+        if len(self.names) <= 64:
+            self.bits = np.zeros(len(row_keys), dtype=np.uint64)
+            for code in range(len(self.names)):
+                self.bits[self.matrix[:, code]] |= np.uint64(1) << np.uint64(code)
+
+    def mask(self, genres, mode='any', rows=None):
+        """
+        Return a boolean mask over catalog rows matching the given genres.
+
+        Args:
+        - genres (list): Genre names to match exactly.
+        - mode (str): 'any' (at least one of them), 'all' (every one of them)
+          or 'none' (none of them).
+        - rows (ndarray): Only test these catalog rows (default: all rows).
+
+        Returns:
+        - ndarray: Boolean mask with one entry per tested row.
+        """
+        if mode not in self.MATCH_MODES:
+            raise ValueError(f'unknown genre match mode {mode!r}')
+        codes = [self.positions[genre] for genre in genres if genre in self.positions]
+        if rows is None:
+            rows = slice(None)
+        if mode == 'all' and len(codes) < len(set(genres)):
+            # Asking for a genre nobody has
+            return np.zeros(len(self.lengths), dtype=bool)[rows]
+
+        if self.bits is not None:
+            wanted = np.uint64(0)
+            for code in codes:
+                wanted |= np.uint64(1) << np.uint64(code)
+            overlap = self.bits[rows] & wanted
+            if mode == 'any':
+                return overlap != 0
+            if mode == 'all':
+                return overlap == wanted
+            return overlap == 0
+
+        selected = self.matrix[rows][:, codes]
+        if mode == 'any':
+            return selected.any(axis=1)
+        if mode == 'all':
+            return selected.all(axis=1)
+        return ~selected.any(axis=1)
+
+    def text_keys(self, genres):
+        """ position in genre_texts of every value of a genres column (-1 if missing or unknown) """
+        if isinstance(genres.dtype, pd.CategoricalDtype):
+            codes = genres.cat.codes.to_numpy()
+            keys = self.genre_texts.get_indexer(genres.cat.categories)
+            return np.where(codes >= 0, keys[codes], -1)
+        return self.genre_texts.get_indexer(genres.to_numpy(dtype=object))
+
+    def explode(self, df, rows=None):
+        """
+        Return df with one row per (movie, genre), like df.explode('genres').
+
+        Movies without genres keep a single row with a missing genre.
+
+        Args:
+        - df (DataFrame): Catalog rows, with their 'genres' column.
+        - rows (ndarray): Catalog row of each row of df (default: df.index,
+          which holds it for the catalog and any row subset of it).
+
+        Raises:
+        - ValueError: If rows are not the catalog rows of df (e.g. its index was
+          reset or it was concatenated), which would mix up movies' genres.
+        """
+        rows = df.index.to_numpy() if rows is None else np.asarray(rows)
+        if len(rows) != len(df) or not np.issubdtype(rows.dtype, np.integer) \
+                or (len(rows) and (rows.min() < 0 or rows.max() >= len(self.lengths))):
+            raise ValueError('explode() needs the catalog row of every row of df')
+        if not np.array_equal(self.row_keys[rows], self.text_keys(df['genres'])):
+            raise ValueError('genres of df do not match the catalog rows given (was its index reset?)')
+        lengths = self.lengths[rows]
+        repeats = np.maximum(lengths, 1)
+        within = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        has_genre = np.repeat(lengths > 0, repeats)
+        flat = np.repeat(self.offsets[rows], repeats) + within
+
+        names = np.array(self.names + [np.nan], dtype=object)
+        genre_codes = np.full(len(flat), len(self.names), dtype=np.int64)
+        genre_codes[has_genre] = self.codes[flat[has_genre]]
+
+        exploded = df.iloc[np.repeat(np.arange(len(df)), repeats)].reset_index(drop=True)
+        exploded['genres'] = names[genre_codes]
+        return exploded
+
+
+def normalize_title(text):
+    """ case-fold and NFKC-normalize a title so lookups ignore case and width """
+    return unicodedata.normalize('NFKC', str(text)).casefold().strip()
+
+
+def trigrams(token):
+    """ return the set of padded character trigrams of a token """
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """
+    Title search over the catalog, built once at load time.
+
+    A title matches when it contains the query (like a case-insensitive
+    substring search, e.g. 'man' finds 'Batman') or when every query word is
+    the start of some word in it (in any order). Matches are ranked by quality:
+    - 3: the whole title equals the query;
+    - 2: the title starts with the query;
+    - 1: every query word is the start of some word in the title;
+    - 0: the title only contains the query inside a word.
+    Within a tier, titles closer in length to the query come first, then
+    catalog order. Only when nothing matches does it fall back to fuzzy
+    (trigram) matching of each word, ranked by similarity, so a misspelt
+    query still finds something.
+
+    Substrings are looked up in a trigram table over the distinct title
+    words, not by scanning titles. Searches for a few letters that match most
+    of the catalog still take more than 5 ms on 1M titles, since every match
+    has to be ranked.
+
+    Attributes:
+    - titles (ndarray): Normalized title of each catalog row.
+    - tokens (ndarray): Sorted distinct title words (the prefix array).
+    - token_rows (ndarray): Catalog rows of each word, grouped in tokens order.
+    - token_offsets (ndarray): Rows of tokens[i] are token_rows[token_offsets[i]:token_offsets[i + 1]].
+    - first_tokens (ndarray): Token id of the first word of each title (-1 if none).
+    - starts_with_word (ndarray): Whether a title starts with its first word
+      (and not with punctuation).
+    """
+
+    FUZZY_THRESHOLD = 0.5
+
+    def __init__(self, titles):
+        """
+        Build the index.
+
+        Args:
+        - titles (Series): The 'title' column of the catalog.
+        """
+        normalized = titles.fillna('').astype(str).str.normalize('NFKC').str.casefold().str.strip()
+        self.titles = normalized.to_numpy(dtype=object)
+        self.title_lengths = normalized.str.len().to_numpy()
+
+        words = normalized.reset_index(drop=True).str.findall(r'\w+').explode().dropna()
+        codes, tokens = pd.factorize(words, sort=True)
+        self.tokens = np.asarray(tokens, dtype=object)
+        rows = words.index.to_numpy()
+        order = np.argsort(codes, kind='stable')
+        self.token_rows = rows[order]
+        self.token_offsets = np.zeros(len(self.tokens) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(self.tokens)), out=self.token_offsets[1:])
+
+        # explode() keeps words in order, so the first entry per row is its first word
+        self.first_tokens = np.full(len(self.titles), -1, dtype=np.int64)
+        is_first = np.ones(len(rows), dtype=bool)
+        is_first[1:] = rows[1:] != rows[:-1]
+        self.first_tokens[rows[is_first]] = codes[is_first]
+        self.starts_with_word = normalized.str.match(r'\w').to_numpy(dtype=bool)
+        self._trigram_index = None
+
+    def _prefix_range(self, prefix):
+        """ return the [start, stop) range of token ids starting with prefix """
+        start = np.searchsorted(self.tokens, prefix, side='left')
+        stop = np.searchsorted(self.tokens, prefix + '\U0010ffff', side='left')
+        return start, stop
+
+    def _token_postings(self, token_ids):
+        """ concatenated catalog rows of the given token ids, with the count per token """
+        starts = self.token_offsets[token_ids]
+        counts = self.token_offsets[token_ids + 1] - starts
+        if len(token_ids) == 0:
+            return np.empty(0, dtype=np.int64), counts
+        rows = np.concatenate([self.token_rows[a:a + n] for a, n in zip(starts, counts)])
+        return rows, counts
+
+    def _build_trigram_index(self):
+        """ trigram → token ids over the word vocabulary (built on first substring or fuzzy search) """
+        index = {}
+        for token_id, token in enumerate(self.tokens):
+            for gram in trigrams(token):
+                index.setdefault(gram, []).append(token_id)
+        # Counts first: a search in another thread only checks _trigram_index
+        self._token_gram_counts = np.array([len(trigrams(token)) for token in self.tokens], dtype=np.int64)
+        self._trigram_index = {gram: np.array(ids, dtype=np.int64) for gram, ids in index.items()}
+
+    def prepare(self):
+        """ build the trigram table now (e.g. from a background thread) instead of on first use """
+        if self._trigram_index is None:
+            self._build_trigram_index()
+
+    def _tokens_containing(self, word):
+        """ ids of the title words containing word """
+        self.prepare()
+        if len(word) >= 3:
+            postings = [self._trigram_index.get(word[i:i + 3]) for i in range(len(word) - 2)]
+            if any(posting is None for posting in postings):
+                return np.empty(0, dtype=np.int64)
+            token_ids = postings[0]
+            for posting in sorted(postings[1:], key=len):
+                token_ids = np.intersect1d(token_ids, posting, assume_unique=True)
+            if len(word) > 3:
+                # Having all its trigrams does not make word a substring yet
+                token_ids = token_ids[np.array([word in token for token in self.tokens[token_ids]], dtype=bool)]
+            return token_ids
+        # Shorter than a trigram: every trigram holding it
+        found = np.zeros(len(self.tokens), dtype=bool)
+        for gram, posting in self._trigram_index.items():
+            if word in gram:
+                found[posting] = True
+        return np.flatnonzero(found)
+
+    def _row_mask(self, rows):
+        """ boolean mask over catalog rows, True at rows """
+        mask = np.zeros(len(self.titles), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def _rows_of_tokens(self, token_ids):
+        """ catalog rows (with repeats) holding any of the given token ids """
+        starts = self.token_offsets[token_ids]
+        counts = self.token_offsets[token_ids + 1] - starts
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self.token_rows[positions]
+
+    def _similar_tokens(self, word):
+        """ token ids similar to word (prefix or trigram Dice coefficient), with their similarity """
+        if self._trigram_index is None:
+            self._build_trigram_index()
+        grams = trigrams(word)
+        postings = [self._trigram_index[gram] for gram in grams if gram in self._trigram_index]
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.tokens)) if postings \
+            else np.zeros(len(self.tokens), dtype=np.int64)
+        similarity = 2 * shared / (len(grams) + self._token_gram_counts)
+        start, stop = self._prefix_range(word)
+        similarity[start:stop] = 1.0
+        token_ids = np.flatnonzero(similarity >= self.FUZZY_THRESHOLD)
+        return token_ids, similarity[token_ids]
+
+    def _fuzzy_search(self, words):
+        """ rows where every word has a similar title word, most similar first """
+        rows, score = None, None
+        for word in words:
+            token_ids, similarity = self._similar_tokens(word)
+            word_rows, counts = self._token_postings(token_ids)
+            # Best similarity per row for this word
+            best = pd.Series(np.repeat(similarity, counts)).groupby(word_rows).max()
+            if rows is None:
+                rows, score = best.index.to_numpy(), best.to_numpy()
+            else:
+                rows, left, right = np.intersect1d(rows, best.index.to_numpy(),
+                                                   assume_unique=True, return_indices=True)
+                score = score[left] + best.to_numpy()[right]
+        return rows[np.argsort(-score, kind='stable')]
+
+    def search(self, text, fuzzy=True):
+        """
+        Find titles matching text, best matches first.
+
+        Args:
+        - text (str): The search text.
+        - fuzzy (bool): Fall back to trigram matching for misspelt words.
+
+        Returns:
+        - ndarray: Catalog rows ordered by match quality (None for a blank query).
+        """
+        query = normalize_title(text)
+        if not query:
+            return None
+        words = re.findall(r'\w+', query)
+        if not words:
+            return np.flatnonzero(self.titles == query)
+
+        # Word matches: every word starts some title word (the last one may still be typed)
+        word_match = None
+        for word in words:
+            start, stop = self._prefix_range(word)
+            mask = self._row_mask(self.token_rows[self.token_offsets[start]:self.token_offsets[stop]])
+            word_match = mask if word_match is None else word_match & mask
+        single_word = query == words[0]
+        if single_word:
+            # Substring matches: the word is inside some title word
+            matched = self._row_mask(self._rows_of_tokens(self._tokens_containing(query)))
+        else:
+            # Substring matches: the query's inner words are whole title words, the
+            # first ends one and the last starts one...
+            contains = None
+            for position, word in enumerate(words):
+                if position == 0:
+                    token_ids = self._tokens_containing(word)
+                    token_ids = token_ids[np.array([token.endswith(word) for token in self.tokens[token_ids]],
+                                                   dtype=bool)]
+                    rows = self._rows_of_tokens(token_ids)
+                else:
+                    start, stop = self._prefix_range(word)
+                    if position < len(words) - 1:
+                        stop = start + int(start < len(self.tokens) and self.tokens[start] == word)
+                    rows = self.token_rows[self.token_offsets[start]:self.token_offsets[stop]]
+                mask = self._row_mask(rows)
+                contains = mask if contains is None else contains & mask
+            # ...and the title holds the query as typed
+            candidates = np.flatnonzero(contains & ~word_match)
+            matched = word_match.copy()
+            matched[candidates[[query in title for title in self.titles[candidates]]]] = True
+        rows = np.flatnonzero(matched)
+        if len(rows) == 0:
+            return self._fuzzy_search(words) if fuzzy else rows
+
+        tier = word_match[rows].astype(np.int8)
+        start, stop = self._prefix_range(words[0])
+        first = self.first_tokens[rows]
+        candidates = np.flatnonzero((first >= start) & (first < stop))
+        if single_word:
+            # The title starts with the query iff it starts with its first word
+            starts = candidates[self.starts_with_word[rows[candidates]]]
+        else:
+            starts = candidates[[title.startswith(query) for title in self.titles[rows[candidates]]]]
+        tier[starts] = 2
+        tier[starts[self.title_lengths[rows[starts]] == len(query)]] = 3
+        # Best tier first, then closest in length to the query, then catalog order
+        # (rows are ascending and a stable sort of 16-bit keys is a radix sort)
+        distance = np.minimum(np.abs(self.title_lengths[rows] - len(query)), 0xfff)
+        key = ((3 - tier).astype(np.uint16) << 12) | distance.astype(np.uint16)
+        return rows[np.argsort(key, kind='stable')]
+
+
+class ValueIndex:
+    """
+    Inverted index over one column: the catalog rows holding each value.
+
+    Attributes:
+    - values (ndarray): Sorted distinct values.
+    - codes (ndarray): Position in values of every row's value (-1 if missing).
+    - rows_by_value (ndarray): Catalog rows grouped by value, ascending within a group.
+    - offsets (ndarray): Rows of values[i] are rows_by_value[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, column):
+        """
+        Build the index.
+
+        Args:
+        - column (Series): A catalog column.
+        """
+        self.codes, values = pd.factorize(column, sort=True)
+        self.values = np.asarray(values)
+        self.positions = {value: position for position, value in enumerate(self.values)}
+        self.rows_by_value = np.argsort(self.codes, kind='stable')
+        counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.values))
+        self.offsets = np.full(len(self.values) + 1, len(self.codes) - counts.sum(), dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.offsets[1:] += self.offsets[0]
+
+    def rows(self, value):
+        """ catalog rows equal to value, in ascending order """
+        position = self.positions.get(value)
+        if position is None:
+            return np.empty(0, dtype=np.int64)
+        return self.rows_by_value[self.offsets[position]:self.offsets[position + 1]]
+
+    def count(self, value):
+        """ number of rows equal to value """
+        return len(self.rows(value))
+
+    def test(self, rows, value):
+        """ boolean mask of which of rows equal value """
+        return self.codes[rows] == self.positions.get(value, -2)
+
+
+class SortIndex:
+    """
+    Sort order of one numeric column, computed once per catalog.
+
+    Attributes:
+    - order (ndarray): Catalog rows in ascending order of value (missing last).
+    - ranks (ndarray): Dense rank of every row's value; equal values share a rank.
+    - missing (ndarray): Which rows have no value.
+    - max_rank (int): Largest rank of a present value (-1 if there are none).
+    """
+
+    def __init__(self, column):
+        """
+        Build the index.
+
+        Args:
+        - column (Series): A numeric catalog column.
+        """
+        values = column.to_numpy(dtype=float)
+        self.missing = np.isnan(values)
+        self.order = np.argsort(values, kind='stable')
+        sorted_values = values[self.order]
+        changes = np.zeros(len(values), dtype=np.int64)
+        changes[1:] = sorted_values[1:] != sorted_values[:-1]
+        self.ranks = np.empty(len(values), dtype=np.int64)
+        self.ranks[self.order] = np.cumsum(changes)
+        present = self.ranks[~self.missing]
+        self.max_rank = int(present.max()) if len(present) else -1
+
+    def keys(self, rows, descending=False):
+        """
+        Integer sort keys of rows: smaller sorts first, missing values always last.
+
+        Returns:
+        - ndarray: Keys in 0..max_rank + 1.
+        """
+        ranks = self.ranks[rows]
+        if descending:
+            ranks = self.max_rank - ranks
+        return np.where(self.missing[rows], self.max_rank + 1, ranks)
+
+
+class YearIndex:
+    """
+    Catalog rows sorted by release year, with where each year starts.
+
+    A year range is one contiguous slice of order, found with two lookups in
+    offsets, so its cost does not depend on the size of the catalog.
+
+    Attributes:
+    - first_year (int): Earliest release year in the catalog.
+    - order (ndarray): Catalog rows by year, ascending within a year (rows without a year left out).
+    - offsets (ndarray): Rows of year first_year + i are order[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, years):
+        """
+        Build the index.
+
+        Args:
+        - years (Series): The 'release_year' column of the catalog.
+        """
+        values = years.to_numpy(dtype=float)
+        present = np.flatnonzero(~np.isnan(values))
+        present_years = values[present].astype(np.int64)
+        self.first_year = int(present_years.min()) if len(present) else 0
+        span = int(present_years.max()) - self.first_year + 1 if len(present) else 0
+
+        positions = present_years - self.first_year
+        self.order = present[np.argsort(positions, kind='stable')]
+        self.offsets = np.zeros(span + 1, dtype=np.int64)
+        np.cumsum(np.bincount(positions, minlength=span), out=self.offsets[1:])
+
+    def _bounds(self, low, high):
+        """ [start, stop) of order for years low..high (inclusive, None = open) """
+        span = len(self.offsets) - 1
+        first = 0 if low is None else min(max(int(np.ceil(low)) - self.first_year, 0), span)
+        last = span if high is None else min(max(int(np.floor(high)) - self.first_year + 1, 0), span)
+        return self.offsets[first], self.offsets[max(first, last)]
+
+    def rows_between(self, low=None, high=None):
+        """ catalog rows released from low to high inclusive, grouped by year """
+        start, stop = self._bounds(low, high)
+        return self.order[start:stop]
+
+    def count_between(self, low=None, high=None):
+        """ number of rows released from low to high inclusive """
+        start, stop = self._bounds(low, high)
+        return int(stop - start)
+
+    def rows(self, year):
+        """ catalog rows released in year, ascending """
+        return self.rows_between(year, year)
+
+    def rows_in(self, years):
+        """ catalog rows released in any of years, ascending """
+        parts = [self.rows(year) for year in set(years)]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
@@ -0,0 +1,199 @@
+"""
+This module runs searches over the catalog without Tk
+"""
+
+import numpy as np
+
+
+class SortedRows:
+    """
+    Query result in sort order, sorted only as far as it is read.
+
+    Reading the first page is a top-K selection (argpartition) rather than a
+    full sort; reading further extends the sorted prefix. Rows with equal keys
+    keep their original order.
+
+    Attributes:
+    - rows (ndarray): Matching catalog rows in their unsorted order.
+    - keys (ndarray): Integer sort key of each row (smaller first).
+    """
+
+    def __init__(self, rows, keys):
+        self.rows = rows
+        self.keys = keys
+        self.order = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        """ return the rows at a position or slice of the sorted order """
+        if isinstance(index, slice):
+            # Positions in the full order; negative bounds count from the end of all rows
+            positions = np.arange(*index.indices(len(self)))
+            self.sort_prefix(int(positions.max()) + 1 if len(positions) else 0)
+            return self.rows[self.order[positions]]
+        position = index + len(self) if index < 0 else index
+        if not 0 <= position < len(self):
+            raise IndexError(f'row {index} out of range for {len(self)} rows')
+        self.sort_prefix(position + 1)
+        return self.rows[self.order[position]]
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:].astype(dtype) if dtype is not None else self[:]
+
+    def sort_prefix(self, count):
+        """ make sure the first count rows of the order are known """
+        if count <= len(self.order):
+            return
+        # Grow geometrically so scrolling down does not redo small selections
+        count = max(count, 2 * len(self.order))
+        if count >= len(self) // 4:
+            self.order = np.argsort(self.keys, kind='stable')
+            return
+        threshold = np.partition(self.keys, count - 1)[count - 1]
+        below = np.flatnonzero(self.keys < threshold)
+        ties = np.flatnonzero(self.keys == threshold)[:count - len(below)]
+        selected = np.concatenate([below, ties])
+        self.order = selected[np.lexsort((selected, self.keys[selected]))]
+
+
+class Predicate:
+    """
+    One filter of a MovieQuery.
+
+    Attributes:
+    - name (str): What the predicate filters on.
+    - size (int): Exact number of matching rows, or None if it has no index.
+    - rows (callable): rows() -> matching catalog rows (indexed predicates only).
+    - test (callable): test(rows) -> boolean mask of which of rows match.
+    """
+
+    def __init__(self, name, test, size=None, rows=None):
+        self.name = name
+        self.test = test
+        self.size = size
+        self.rows = rows
+
+
+class MovieQuery:
+    """
+    A search over the catalog, as set up on the search page.
+
+    run() never copies the catalog: the most selective indexed predicate
+    (the one matching the fewest rows) produces the candidate rows, and the
+    other predicates only look up those candidates.
+
+    Attributes:
+    - title (str): Title search text.
+    - year_from (int): Earliest release year.
+    - year_to (int): Latest release year.
+    - genres (list): Genres to match.
+    - genre_match (str): 'any', 'all' or 'none' of the genres.
+    - language (str): Original language.
+    - sort_by (list): (column, descending) pairs, highest priority first;
+      later keys only break ties of earlier ones.
+    """
+
+    def __init__(self, title='', year_from=None, year_to=None, genres=(), genre_match='any', language=None,
+                 sort_by=()):
+        self.title = title
+        self.year_from = year_from
+        self.year_to = year_to
+        self.genres = list(genres)
+        self.genre_match = genre_match
+        self.language = language
+        self.sort_by = list(sort_by)
+
+    def predicates(self, db):
+        """
+        Return the Predicates of this query over db.
+
+        Args:
+        - db (MovieDB): The catalog to search.
+        """
+        predicates = []
+        if self.language:
+            predicates.append(Predicate(
+                'language',
+                lambda rows: db.language_index.test(rows, self.language),
+                size=db.language_index.count(self.language),
+                rows=lambda: db.language_index.rows(self.language)))
+
+        if self.year_from is not None or self.year_to is not None:
+            years = db.orig_df['release_year'].to_numpy()
+            low = -np.inf if self.year_from is None else self.year_from
+            high = np.inf if self.year_to is None else self.year_to
+            predicates.append(Predicate(
+                'release_year',
+                lambda rows: (years[rows] >= low) & (years[rows] <= high),
+                size=db.year_index.count_between(self.year_from, self.year_to),
+                # The slice is grouped by year; put it back in catalog order
+                rows=lambda: np.sort(db.year_index.rows_between(self.year_from, self.year_to))))
+
+        if self.genres:
+            predicates.append(Predicate(
+                'genres',
+                lambda rows: db.genre_index.mask(self.genres, self.genre_match, rows)))
+        return predicates
+
+    def run(self, db):
+        """
+        Run the query.
+
+        Args:
+        - db (MovieDB): The catalog to search.
+
+        Returns:
+        - Matching catalog rows in display order: best title match first when
+          searching by title, catalog order otherwise. An ndarray, or
+          SortedRows (which slices like one) when sort_by is set.
+        """
+        predicates = self.predicates(db)
+        title_rows = db.title_index.search(self.title) if self.title else None
+
+        indexed = [predicate for predicate in predicates if predicate.size is not None]
+        driver = min(indexed, key=lambda predicate: predicate.size, default=None)
+        if title_rows is not None and (driver is None or len(title_rows) <= driver.size):
+            # Title matches are already ranked; filtering them keeps that order
+            rows = title_rows
+            title_rows = None
+            driver = None
+        elif driver is not None:
+            rows = driver.rows()
+        else:
+            rows = np.arange(len(db.orig_df))
+
+        for predicate in predicates:
+            if predicate is not driver and len(rows):
+                rows = rows[predicate.test(rows)]
+
+        if title_rows is not None:
+            # Keep the rows that also match the title, in title rank order
+            _, _, rank = np.intersect1d(rows, title_rows, assume_unique=True, return_indices=True)
+            rows = title_rows[np.sort(rank)]
+
+        if self.sort_by:
+            return SortedRows(rows, self.sort_keys(db, rows))
+        return rows
+
+    def sort_keys(self, db, rows):
+        """
+        Combine the sort_by columns into one integer key per row.
+
+        Falls back to the full lexicographic order if the combined key would
+        not fit in 64 bits.
+        """
+        keys = np.zeros(len(rows), dtype=np.int64)
+        span = 1
+        for column, descending in self.sort_by:
+            index = db.sort_index(column)
+            width = index.max_rank + 2
+            if span * width >= 2 ** 62:
+                columns = [db.sort_index(name).keys(rows, flag) for name, flag in reversed(self.sort_by)]
+                ranks = np.empty(len(rows), dtype=np.int64)
+                ranks[np.lexsort(columns)] = np.arange(len(rows))
+                return ranks
+            keys = keys * width + index.keys(rows, descending)
+            span *= width
+        return keys
@@ -1,5 +1,11 @@
+import pandas as pd
 from movie_ui import MainApplication
 
 if __name__ == '__main__':
+    # Pages share one catalog and only ever hold views of it. Copy-on-write keeps
+    # a page that assigns into its view from changing what the other pages see.
+    # (Always on from pandas 3.)
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
     app = MainApplication()
     app.mainloop()
@@ -1,10 +1,18 @@
 """
 This module contains UI for the Application
 """
+import matplotlib
+# Pick the backend before anything imports pyplot or a backend module
+matplotlib.use("TkAgg")
 import tkinter as tk
 from tkinter import ttk, Scrollbar
-from Database import MovieDB
-from MovieController import StorytellingGraph, ExplorationGraph
+from Database import MovieDB, add_reload_listener, get_movie_db, reload_movie_db
+from MovieController import StorytellingGraph, ExplorationGraph, ChartCache, ChartWorker
+from MovieQuery import MovieQuery
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+import numpy as np
+import threading
 import webbrowser
 
 
@@ -13,13 +21,18 @@ class MainApplication(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Movie picks application")
-        self.movie_db = MovieDB()
+        self.movie_db = get_movie_db()
         self.df = self.movie_db.get_orig_df()
         # self.minsize(800, 600)
 
         self.init_frames()
-        self.populate_dropdowns()
         self.init_components()
+        # Prepare the analysis pages' data while the user is on the search page
+        self.warm_up_thread = threading.Thread(target=self.movie_db.warm_up, daemon=True)
+        self.after_idle(self.warm_up_thread.start)
+        # Reloads load the catalog in the background, then swap it in on the Tk thread
+        self.reload_worker = ChartWorker(self)
+        add_reload_listener(self.on_catalog_reloaded)
 
     def init_components(self):
         """Initialize the main application."""
@@ -27,43 +40,174 @@ class MainApplication(tk.Tk):
         self.config(menu=menu_bar)
 
         file_menu = tk.Menu(menu_bar, tearoff=False)
+        file_menu.add_command(label="Reload catalog", command=self.reload_catalog)
         file_menu.add_command(label="Exit", command=self.quit)
 
         menu_bar.add_cascade(label="File", menu=file_menu)
 
     def init_frames(self):
-        """Initialize the menu bar."""
+        """Initialize the notebook and frames."""
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill=tk.BOTH, expand=True)
 
-        self.search_page = SearchPage(self.notebook)
-        self.data_storytelling_page = DataStorytellingPage(self.notebook)
-        self.data_exploration_page = DataExplorationPage(self.notebook, self.df, self.movie_db)
+        # The search page is ready at once; the others are built when first opened
+        self.search_page = SearchPage(self.notebook, self.movie_db)
+        self.data_storytelling_tab = LazyPage(self.notebook,
+                                              lambda parent: DataStorytellingPage(parent, self.movie_db))
+        self.data_exploration_tab = LazyPage(self.notebook,
+                                             lambda parent: DataExplorationPage(parent, self.df, self.movie_db))
 
         self.notebook.add(self.search_page, text="Search Page")
-        self.notebook.add(self.data_storytelling_page, text="Data Storytelling")
-        self.notebook.add(self.data_exploration_page, text="Data Exploration")
-
+        self.notebook.add(self.data_storytelling_tab, text="Data Storytelling")
+        self.notebook.add(self.data_exploration_tab, text="Data Exploration")
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+
+    def reload_catalog(self):
+        """Load the catalog again (e.g. after the CSV changed) without blocking the UI"""
+        def load():
+            db = MovieDB()
+            db.warm_up()
+            return db
+        self.reload_worker.submit(load, reload_movie_db)
+
+    def on_catalog_reloaded(self, db):
+        """Point every page at the reloaded catalog"""
+        self.movie_db = db
+        self.df = db.get_orig_df()
+        self.search_page.set_db(db)
+        # Pages not built yet pick up self.movie_db when they are
+        for tab in (self.data_storytelling_tab, self.data_exploration_tab):
+            if tab.page is not None:
+                tab.page.set_db(db)
+
+    def on_tab_changed(self, event=None):
+        """Builds the selected page on its first visit"""
+        tab = self.nametowidget(self.notebook.select())
+        if not isinstance(tab, LazyPage) or tab.page is not None:
+            return
+        if self.warm_up_thread.is_alive():
+            # Data still being prepared: keep showing "Loading..." without blocking
+            self.after(100, self.on_tab_changed)
+            return
+        tab.build()
+
+
+class LazyPage(tk.Frame):
+    """
+    Notebook tab that builds its page the first time it is shown.
+
+    Attributes:
+    - factory (callable): factory(parent) -> the page.
+    - page (Frame): The page, or None until built.
+    """
+    def __init__(self, parent, factory):
+        super().__init__(parent)
+        self.factory = factory
+        self.page = None
+        self.loading_label = ttk.Label(self, text="Loading...", font=('Arial', 14))
+        self.loading_label.pack(pady=40)
+
+    def build(self):
+        """ build and show the page if it is not built yet """
+        if self.page is None:
+            self.page = self.factory(self)
+            self.loading_label.destroy()
+            self.page.pack(fill=tk.BOTH, expand=True)
+        return self.page
+
+
+class VirtualTreeview(ttk.Treeview):
+    """
+    Treeview that only holds the rows on screen plus a small buffer.
+
+    The rows to show are catalog row numbers; row_values(rows) turns the rows
+    scrolled into view into Treeview values, and the row number is the item
+    iid (unique even when two movies share an id). Filling or clearing the
+    view costs the same whether there are ten results or a million.
+    """
+    BUFFER = 5
+
+    def __init__(self, parent, row_values, **kwargs):
+        """Initialize the treeview with a row_values(rows) callback."""
+        super().__init__(parent, **kwargs)
+        self.row_values = row_values
+        self.rows = np.empty(0, dtype=np.int64)
+        self.first = 0
+        self.scrollbar = None
+
+        self.bind('<Configure>', lambda event: self.render())
+        self.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.bind('<Button-4>', lambda event: self.scroll('scroll', -3, 'units'))
+        self.bind('<Button-5>', lambda event: self.scroll('scroll', 3, 'units'))
+
+    def set_scrollbar(self, scrollbar):
+        """Drive scrollbar from the virtual position."""
+        self.scrollbar = scrollbar
+        scrollbar.config(command=self.scroll)
+
+    def set_rows(self, rows):
+        """
+        Show rows (catalog row numbers, in display order) from the top.
+
+        rows can be anything with len() and slicing, e.g. a lazily sorted
+        SortedRows, so only the part scrolled to is ever ordered.
+        """
+        self.rows = rows
+        self.first = 0
+        self.render()
+
+    def visible_count(self):
+        """Number of rows that fit in the widget."""
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        # One row's worth of height goes to the headings
+        return max(int(self.cget('height')), self.winfo_height() // row_height - 1)
+
+    def render(self):
+        """Materialize the rows in the current window."""
+        self.delete(*self.get_children())
+        window = self.rows[self.first:self.first + self.visible_count() + self.BUFFER]
+        for row, values in zip(window, self.row_values(window)):
+            self.insert('', 'end', iid=str(row), values=values)
+
+        if self.scrollbar is not None:
+            total = max(len(self.rows), 1)
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible_count()) / total))
+
+    def scroll(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'/'pages')."""
+        visible = self.visible_count()
+        if args[0] == 'moveto':
+            first = int(float(args[1]) * len(self.rows))
+        elif args[2] == 'pages':
+            first = self.first + int(args[1]) * visible
+        else:
+            first = self.first + int(args[1])
+        first = max(0, min(first, len(self.rows) - visible))
+        if first != self.first:
+            self.first = first
+            self.render()
+        return 'break'
 
-    def populate_dropdowns(self):
-        """Initialize the notebook and frames."""
-        languages = self.df['original_language'].unique()
-        self.data_storytelling_page.language_dropdown['values'] = [x for x in languages]
+    def focused_row(self):
+        """Catalog row number of the focused item, or None."""
+        iid = self.focus()
+        return int(iid) if iid else None
 
-        stories = ['Descriptive statistics of revenue and budget', 'Correlation of revenue and budget',
-                   'Histogram of revenue and budget',
-                   'Bar graph of avg revenue and budget by genre', 'Trend of revenue over the years']
-        self.data_storytelling_page.story_dropdown['values'] = stories
+    def on_mouse_wheel(self, event):
+        """Scroll three rows per wheel notch."""
+        return self.scroll('scroll', -3 if event.delta > 0 else 3, 'units')
 
 
 class SearchPage(tk.Frame):
     """Frame for the search page."""
-    def __init__(self, parent):
+    GENRE_MATCH_MODES = {'Any of': 'any', 'All of': 'all', 'None of': 'none'}
+
+    def __init__(self, parent, db):
         """Initialize the search page."""
         super().__init__(parent)
-        self.db = MovieDB()
+        self.db = db
         self.df = self.db.get_orig_df()
-        self.df_sep_genres = self.db.get_separated_genres(self.df)
+        self.details_worker = ChartWorker(self)
         self.configure(bg='#FAC589')
         self.init_components()
 
@@ -110,6 +254,26 @@ class SearchPage(tk.Frame):
 
         # Bind the Enter key to the filter_results method
         self.search_bar.bind('<Return>', lambda event: self.filter_results())
+        # Search as you type, once typing pauses
+        self.search_job = None
+        self.typed_text = ''
+        self.search_bar.bind('<KeyRelease>', self.schedule_search)
+
+    def schedule_search(self, event=None):
+        """Run the search shortly after the last keystroke that changed the search text."""
+        # Arrows, Shift, Ctrl, Return (searched already) etc. leave the text as it was
+        text = self.search_input.get()
+        if text == self.typed_text:
+            return
+        self.typed_text = text
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(150, self.run_scheduled_search)
+
+    def run_scheduled_search(self):
+        """Run a search scheduled by schedule_search."""
+        self.search_job = None
+        self.filter_results()
 
     def init_filters_frame(self):
         """Initialize the filters frame."""
@@ -122,8 +286,6 @@ class SearchPage(tk.Frame):
 
         self.genre_list_var = tk.Variable()
         self.genre_list_box = tk.Listbox(self.filters_frame, selectmode=tk.MULTIPLE, listvariable=self.genre_list_var)
-        for value in self.df_sep_genres['genres'].unique():
-            self.genre_list_box.insert(tk.END, value)
 
         # Add scrollbar to the genre list box
         genre_scrollbar = Scrollbar(self.filters_frame, orient=tk.VERTICAL, )
@@ -131,11 +293,28 @@ class SearchPage(tk.Frame):
         self.genre_list_box.config(yscrollcommand=genre_scrollbar.set, width=15)
         genre_scrollbar.grid(row=2, column=1, sticky='ns')
 
+        self.genre_match_label = ttk.Label(self.filters_frame, text='Genre Match', font=self.font_small)
+        self.genre_match_combobox = ttk.Combobox(self.filters_frame,
+                                                 values=list(self.GENRE_MATCH_MODES),
+                                                 font=self.font_small,
+                                                 state='readonly')
+        self.genre_match_combobox.set('Any of')
+
+        self.sort_priority_label = ttk.Label(self.filters_frame, text='Sort Priority', font=self.font_small)
+        self.sort_priority_combobox = ttk.Combobox(self.filters_frame,
+                                                   values=['Rating first', 'Popularity first'],
+                                                   font=self.font_small,
+                                                   state='readonly')
+        self.sort_priority_combobox.set('Popularity first')
+
+        # Tells why the filters can't be applied (e.g. a year that is not a number)
+        self.filter_message = ttk.Label(self.filters_frame, foreground='red', font=self.font_small)
+
         self.lang_list_label = ttk.Label(self.filters_frame, text='Original Language', font=self.font_small)
         self.lang_list_var = tk.StringVar()
         self.lang_combobox = ttk.Combobox(self.filters_frame, textvariable=self.lang_list_var, font=self.font_small,
                                           state='readonly')
-        self.lang_combobox['values'] = list(self.df_sep_genres['original_language'].unique())
+        self.fill_filters()
 
         self.rating_label = ttk.Label(self.filters_frame, text='Rating', font=self.font_small)
         self.rating_combobox = ttk.Combobox(self.filters_frame,
@@ -163,12 +342,19 @@ class SearchPage(tk.Frame):
         self.rating_combobox.grid(row=3, column=1, padx=5, pady=5)
         self.popularity_label.grid(row=3, column=2, padx=5, pady=5)
         self.popularity_combobox.grid(row=3, column=3, padx=5, pady=5)
+        self.genre_match_label.grid(row=4, column=0, padx=5, pady=5)
+        self.genre_match_combobox.grid(row=4, column=1, padx=5, pady=5)
+        self.sort_priority_label.grid(row=4, column=2, padx=5, pady=5)
+        self.sort_priority_combobox.grid(row=4, column=3, padx=5, pady=5)
+        self.filter_message.grid(row=5, column=0, columnspan=4, padx=5, pady=5, sticky='w')
 
     def init_results_frame(self):
         """Initialize the results frame."""
-        self.results_tree_view = ttk.Treeview(self.results_frame,
-                                              columns=('Title', 'Release Year', 'Genres', 'Vote Average', 'Popularity'),
-                                              show='headings')
+        self.load_result_columns()
+        self.results_tree_view = VirtualTreeview(self.results_frame, self.get_row_values,
+                                                 columns=('Title', 'Release Year', 'Genres', 'Vote Average',
+                                                          'Popularity'),
+                                                 show='headings')
         self.results_tree_view.heading('Title', text='Title')
         self.results_tree_view.heading('Release Year', text='Release Year')
         self.results_tree_view.heading('Genres', text='Genres')
@@ -180,80 +366,211 @@ class SearchPage(tk.Frame):
 
         # Add scrollbar to the results treeview
         results_scrollbar = Scrollbar(self.results_frame, orient=tk.VERTICAL)
-        results_scrollbar.config(command=self.results_tree_view.yview)
-        self.results_tree_view.config(yscrollcommand=results_scrollbar.set)
+        self.results_tree_view.set_scrollbar(results_scrollbar)
         results_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         self.results_tree_view.bind('<ButtonRelease-1>', self.open_imdb_link)
+        self.results_tree_view.bind('<<TreeviewSelect>>', self.show_details)
+
+        # Tagline and overview of the selected movie, read from the catalog per movie
+        self.details_text = tk.Text(self.results_frame, height=6, wrap=tk.WORD, font=self.font_small,
+                                    state='disabled')
+        self.details_text.pack(side=tk.BOTTOM, fill=tk.X)
 
         self.results_tree_view.pack(expand=True, fill=tk.BOTH)
 
+    def fill_filters(self):
+        """Offer the genres and languages of the catalog, keeping the selections it still has."""
+        selected = {self.genre_list_box.get(index) for index in self.genre_list_box.curselection()}
+        self.genre_list_box.delete(0, tk.END)
+        for index, value in enumerate(self.db.get_genres()):
+            self.genre_list_box.insert(tk.END, value)
+            if value in selected:
+                self.genre_list_box.selection_set(index)
+        languages = list(self.df['original_language'].unique())
+        self.lang_combobox['values'] = languages
+        if self.lang_combobox.get() and self.lang_combobox.get() not in languages:
+            self.lang_combobox.set('')
+
+    def load_result_columns(self):
+        """Read the column arrays the visible rows are read from out of the catalog."""
+        self.result_columns = [self.df[column].to_numpy() for column in
+                               ('title', 'release_year', 'genres', 'vote_average', 'popularity')]
+
+    def get_row_values(self, rows):
+        """Treeview values of the given catalog rows."""
+        return zip(*(column[rows] for column in self.result_columns))
+
+    def show_details(self, event=None):
+        """Show the tagline and overview of the selected movie."""
+        row = self.results_tree_view.focused_row()
+        if row is None:
+            self.details_worker.cancel()
+            self.display_details([])
+            return
+        db = self.db
+
+        def read_details():
+            # Without a catalog cache, read both columns in one pass over the CSV
+            db.load_text_columns(('tagline', 'overview'))
+            details = []
+            for column in ('tagline', 'overview'):
+                text = db.text_column(column)[row]
+                if isinstance(text, str) and text:
+                    details.append(text)
+            return details
+
+        # Without a catalog cache the first read parses the CSV: keep it off the Tk thread
+        self.details_worker.submit(read_details, self.display_details)
+
+    def display_details(self, details):
+        """Show the given tagline and overview texts."""
+        self.details_text['state'] = 'normal'
+        self.details_text.delete('1.0', tk.END)
+        self.details_text.insert('1.0', '\n\n'.join(details))
+        self.details_text['state'] = 'disabled'
+
     def open_imdb_link(self, event):
         """ Open the IMDB link"""
-        item = self.results_tree_view.item(self.results_tree_view.focus())
-        title = item['values'][0]  # Assuming title is the first column
-        row = self.df[self.df['title'] == title].iloc[0]
-        imdb_link = row['imdb_link']
-        if imdb_link:
+        row = self.results_tree_view.focused_row()
+        if row is None:
+            return
+        imdb_link = self.db.orig_df['imdb_link'].iloc[row]
+        if isinstance(imdb_link, str) and imdb_link:
             webbrowser.open(imdb_link)
 
-    def filter_results(self):
-        """Filter results based on user input."""
-        # Clear previous search results
-        for item in self.results_tree_view.get_children():
-            self.results_tree_view.delete(item)
-
-        # Get user input
-        search_term = self.search_input.get()
+    @staticmethod
+    def parse_year(text):
+        """Year typed in a release year entry, None if it is empty; ValueError if it is not a year."""
+        text = text.strip()
+        if not text:
+            return None
+        if not text.isdigit():
+            raise ValueError(f'Release year {text!r} is not a whole number')
+        return int(text)
+
+    def build_query(self):
+        """Build a MovieQuery from the filter widgets (ValueError if they don't make one)."""
         release_year_from = self.release_year_from.get()
         release_year_to = self.release_year_to.get()
-        selected_genres = [self.genre_list_box.get(index) for index in self.genre_list_box.curselection()]
-        selected_language = self.lang_combobox.get()  # Get the selected language directly from the Combobox
         rating_filter = self.rating_combobox.get()
         popularity_filter = self.popularity_combobox.get()
 
-        # Filter the DataFrame based on user input
-        filtered_df = self.df.copy()
-        if search_term:
-            filtered_df = filtered_df[filtered_df['title'].str.contains(search_term, case=False)]
-        if release_year_from:
-            release_year_from = int(release_year_from)
-            filtered_df = filtered_df[filtered_df['release_year'] >= release_year_from]
-        if release_year_to:
-            release_year_to = int(release_year_to)
-            filtered_df = filtered_df[filtered_df['release_year'] <= release_year_to]
-        if not release_year_from and not release_year_to:
-            # If both "from" and "to" are not filled, search for all years
-            pass
-        if selected_genres:
-            filtered_df = filtered_df[
-                filtered_df['genres'].apply(lambda x: any(genre in x for genre in selected_genres))]
-        if selected_language:  # Check if a language is selected
-            filtered_df = filtered_df[filtered_df['original_language'] == selected_language]
-        if rating_filter == 'Most Rated':
-            filtered_df = filtered_df.sort_values(by='vote_average', ascending=False)
-        elif rating_filter == 'Least Rated':
-            filtered_df = filtered_df.sort_values(by='vote_average', ascending=True)
-        if popularity_filter == 'Most Popular':
-            filtered_df = filtered_df.sort_values(by='popularity', ascending=False)
-        elif popularity_filter == 'Least Popular':
-            filtered_df = filtered_df.sort_values(by='popularity', ascending=True)
-
-        for index, row in filtered_df.iterrows():
-            values = tuple(row[['title', 'release_year', 'genres', 'vote_average', 'popularity']])
-            self.results_tree_view.insert('', 'end', values=values)
+        # The second key only breaks ties of the first
+        sort_by = []
+        if rating_filter in ('Most Rated', 'Least Rated'):
+            sort_by.append(('vote_average', rating_filter == 'Most Rated'))
+        if popularity_filter in ('Most Popular', 'Least Popular'):
+            sort_by.append(('popularity', popularity_filter == 'Most Popular'))
+        if self.sort_priority_combobox.get() == 'Popularity first':
+            sort_by.reverse()
+
+        return MovieQuery(
+            title=self.search_input.get(),
+            year_from=self.parse_year(release_year_from),
+            year_to=self.parse_year(release_year_to),
+            genres=[self.genre_list_box.get(index) for index in self.genre_list_box.curselection()],
+            genre_match=self.GENRE_MATCH_MODES[self.genre_match_combobox.get()],
+            language=self.lang_combobox.get() or None,
+            sort_by=sort_by,
+        )
+
+    def set_db(self, db):
+        """Search the reloaded catalog db from now on"""
+        self.details_worker.cancel()
+        self.db = db
+        self.df = db.get_orig_df()
+        self.load_result_columns()
+        self.fill_filters()
+        # Rows of the old catalog mean nothing in the new one, even if the search fails
+        self.results_tree_view.set_rows(np.empty(0, dtype=np.int64))
+        self.display_details([])
+        self.filter_results()
+
+    def filter_results(self):
+        """Filter results based on user input."""
+        try:
+            query = self.build_query()
+        except ValueError as error:
+            # Keep the previous results until the filters are fixed
+            self.filter_message['text'] = str(error)
+            return
+        self.filter_message['text'] = ''
+        rows = query.run(self.db)
+        # Replaces the previous results; only the rows on screen are built
+        self.results_tree_view.set_rows(rows)
+
+
+class ChartView(tk.Frame):
+    """
+    The chart area of a page: one text box, one figure and one canvas, reused
+    for every chart shown.
+
+    Charts arrive already rendered (see ChartResult), so showing one only
+    clears the figure and blits the new pixels onto it.
+    """
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.message = ttk.Label(self, foreground='red')
+        self.text_widget = tk.Text(self, height=10, width=50, font=('Arial', 14), state='disabled')
+        self.figure = Figure()
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self)
+        self.canvas_widget = self.canvas.get_tk_widget()
+
+    def clear(self):
+        """ hide everything shown """
+        for widget in (self.message, self.text_widget, self.canvas_widget):
+            widget.pack_forget()
+
+    def show_result(self, result):
+        """ show a ChartResult """
+        self.clear()
+        if result.text is not None:
+            self.text_widget['state'] = 'normal'
+            self.text_widget.delete('1.0', tk.END)
+            self.text_widget.insert(tk.END, result.text)
+            self.text_widget['height'] = 4 if result.image is not None else 10
+            self.text_widget['state'] = 'disabled'
+            self.text_widget.pack()
+        self.figure.clear()
+        if result.image is not None:
+            height, width = result.image.shape[:2]
+            self.figure.set_dpi(result.dpi)
+            self.figure.set_size_inches(width / result.dpi, height / result.dpi, forward=True)
+            self.figure.figimage(result.image, resize=False)
+            self.canvas.draw()
+            self.canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+
+    def show_error(self, error):
+        """ tell the user a chart could not be built """
+        self.clear()
+        self.figure.clear()
+        self.message['text'] = f"Could not build the chart: {error}"
+        self.message.pack(pady=5)
+
 
 class DataStorytellingPage(tk.Frame):
     """Frame for data storytelling."""
-    def __init__(self, parent):
+    def __init__(self, parent, db):
         """Initialize the data storytelling page."""
         super().__init__(parent)
         self.parent = parent
+        self.db = db
         self.label = ttk.Label(self, text="Data Storytelling Page", font=('Arial',20))
         self.label.pack(pady=20)
         self.init_components()
-        self.storytelling_manager = StorytellingGraph(self)
-        self.current_canvas = None
+        self.storytelling_manager = StorytellingGraph(self, self.db)
+        self.worker = ChartWorker(self)
+        self.chart_cache = ChartCache()
+        self.chart_view = ChartView(self)
+
+    def set_db(self, db):
+        """Tell stories from the reloaded catalog db; charts of the old one are dropped"""
+        self.cancel_story()
+        self.db = db
+        self.storytelling_manager = StorytellingGraph(self, db)
+        self.chart_cache.clear()
+        self.language_dropdown['values'] = list(db.orig_df['original_language'].unique())
 
     def init_components(self):
         """Initialize components of the data storytelling page."""
@@ -262,65 +579,117 @@ class DataStorytellingPage(tk.Frame):
         self.language_label.pack()
         self.language_var = tk.StringVar()
         self.language_dropdown = ttk.Combobox(self, textvariable=self.language_var, width=42, state='readonly')
+        self.language_dropdown['values'] = list(self.db.orig_df['original_language'].unique())
         self.language_dropdown.pack(pady=5)
+        self.language_dropdown.bind('<<ComboboxSelected>>', self.cancel_story)
 
         # Dropdown menu for selecting the story to tell
         self.story_label = ttk.Label(self, text="Select the Story to know:")
         self.story_label.pack()
         self.story_var = tk.StringVar()
         self.story_dropdown = ttk.Combobox(self, textvariable=self.story_var, width=42, state='readonly')
+        self.story_dropdown['values'] = list(StorytellingGraph.STORIES)
         self.story_dropdown.pack(pady=5)
+        self.story_dropdown.bind('<<ComboboxSelected>>', self.cancel_story)
+
+        # Large languages get a density map unless every point is asked for
+        self.exact_var = tk.BooleanVar(value=False)
+        self.exact_check = ttk.Checkbutton(self, text="Draw every point", variable=self.exact_var)
+        self.exact_check.pack(pady=5)
+
+        # Bootstrapped confidence intervals are opt-in: they need every movie
+        self.confidence_var = tk.BooleanVar(value=False)
+        self.confidence_check = ttk.Checkbutton(self, text="Confidence intervals (slow)",
+                                                variable=self.confidence_var)
+        self.confidence_check.pack(pady=5)
 
         # Button to show the selected story
         self.show_story_button = ttk.Button(self, text="Show Story", command=self.show_story)
         self.show_story_button.pack()
 
+        # Shown while a story is being built
+        self.progress = ttk.Progressbar(self, mode='indeterminate', length=200)
+
     def show_story(self):
         """Shows story when pressed"""
         selected_language = self.language_var.get()
         selected_story = self.story_var.get()
-        # Use the selected language and story to show the relevant information or visualization
-        self.storytelling_manager.selected_language = selected_language
-
-        if self.current_canvas:
-            self.current_canvas.pack_forget()
-
-        if selected_story == "Descriptive statistics of revenue and budget":
-            self.current_canvas = self.storytelling_manager.get_descriptive_stats(self)
-
-        elif selected_story == "Correlation of revenue and budget":
-            self.current_canvas = self.storytelling_manager.get_correlation(self)
-
-        elif selected_story == "Histogram of revenue and budget":
-            self.current_canvas = self.storytelling_manager.get_histogram(self)
+        exact = self.exact_var.get()
+        confidence = self.confidence_var.get()
+        if selected_story not in StorytellingGraph.STORIES:
+            return
+        key = self.chart_cache.key(self.db, 'story', selected_story, selected_language, exact, confidence)
+        cached = self.chart_cache.get(key)
+        if cached is not None:
+            self.cancel_story()
+            self.display_story(cached)
+            return
+        # Build the story in the background; the window stays responsive meanwhile
+        job = lambda: self.storytelling_manager.get_story(selected_language, selected_story, exact, confidence)
+        self.worker.submit(job, lambda result: self.store_story(key, result), self.display_error)
+        self.set_busy(True)
+
+    def store_story(self, key, result):
+        """Keeps a built story for repeat views and shows it"""
+        self.chart_cache.put(key, result)
+        self.display_story(result)
+
+    def cancel_story(self, event=None):
+        """Drops a story still being built once the selection changes"""
+        if self.worker.busy:
+            self.worker.cancel()
+            self.set_busy(False)
+
+    def set_busy(self, busy):
+        """Shows or hides the progress bar"""
+        if busy:
+            self.progress.pack(pady=5)
+            self.progress.start(10)
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
 
-        elif selected_story == "Bar graph of avg revenue and budget by genre":
-            self.current_canvas = self.storytelling_manager.get_bar_graph(self)
+    def display_story(self, result):
+        """Shows a built story"""
+        self.set_busy(False)
+        self.chart_view.show_result(result)
+        self.chart_view.pack(pady=5)
 
-        elif selected_story == "Trend of revenue over the years":
-            self.current_canvas = self.storytelling_manager.get_trend(self)
-        self.current_canvas.pack(pady=5)
+    def display_error(self, error):
+        """Shows why a story could not be built"""
+        self.set_busy(False)
+        self.chart_view.show_error(error)
+        self.chart_view.pack(pady=5)
 
 
 class DataExplorationPage(tk.Frame):
     """Frame for data exploration."""
     def __init__(self, parent, df, db):
         super().__init__(parent)
-        self.graph_controller = ExplorationGraph(self)
-        self.init_components()
         self.df = df
         self.db = db
-        self.df_sep_genres = self.db.get_separated_genres(self.df)
+        self.graph_controller = ExplorationGraph(self, self.db)
+        self.worker = ChartWorker(self)
+        self.chart_cache = ChartCache()
+        self.init_components()
 
         self.selected_genre = []
         self.current_plot = None
-        self.current_canvas = None  # Initialize current_canvas
+
+    def set_db(self, db):
+        """Plot the reloaded catalog db; graphs of the old one are dropped"""
+        self.cancel_graph()
+        self.db = db
+        self.df = db.get_orig_df()
+        self.graph_controller = ExplorationGraph(self, db)
+        self.chart_cache.clear()
 
     def init_components(self):
         """Initialize the data exploration page."""
         self.font_combo = ('Arial', 8)
         self.font = ('Arial', 14)
         self.left_frame = tk.Frame(self, bg='black')
+        self.chart_view = ChartView(self.left_frame)
         self.right_frame = tk.Frame(self)
 
         # Right
@@ -333,6 +702,9 @@ class DataExplorationPage(tk.Frame):
         graph_label.pack(pady=20)
         self.graph_combobox.pack()
 
+        # Shown while a graph is being built
+        self.progress = ttk.Progressbar(self.right_frame, mode='indeterminate', length=200)
+
 
 
         self.left_frame.grid(column=0, row=0, sticky='nesw')
@@ -344,42 +716,63 @@ class DataExplorationPage(tk.Frame):
         self.columnconfigure(1, weight=1)
 
     def show_graph(self):
-        """ Calls StorytellingGraph the plot the graph """
-        if self.current_canvas:
-            self.current_canvas.pack_forget()
-
+        """ Builds the selected graph in the background and shows it when done """
+        # Read the selection here: Tk variables must not be used from the worker
+        x_attribute = self.x_axis_var.get()
+        y_attribute = self.y_axis_var.get()
+        selected_sub_values = self.get_selected_sub_values()
+        exact = self.exact_var.get()
+        confidence = self.confidence_var.get()
+        key = self.chart_cache.key(self.db, self.current_graph, x_attribute, selected_sub_values, y_attribute,
+                                   exact, confidence)
+        cached = self.chart_cache.get(key)
+        if cached is not None:
+            self.cancel_graph()
+            self.display_graph(cached)
+            return
         if self.current_graph == "Bar Graph":
-            x_attribute = self.x_axis_var.get()
-            y_attribute = self.y_axis_var.get()
-            selected_sub_values = self.get_selected_sub_values()
-            self.current_canvas = self.graph_controller.plot_bar_graph(
-                self.left_frame,
-                x_attribute,
-                selected_sub_values,
-                y_attribute
-            )
-            self.current_canvas.pack(pady=5)
+            job = lambda: self.graph_controller.plot_bar_graph(x_attribute, selected_sub_values, y_attribute,
+                                                               confidence=confidence)
         elif self.current_graph == 'Line Plot':
-            x_attribute = self.x_axis_var.get()
-            y_attribute = self.y_axis_var.get()
-            selected_sub_values = self.get_selected_sub_values()
-            self.current_canvas = self.graph_controller.plot_line_plot(
-                self.left_frame,
-                x_attribute,
-                selected_sub_values,
-                y_attribute
-            )
-            self.current_canvas.pack(pady=5)
+            job = lambda: self.graph_controller.plot_line_plot(x_attribute, selected_sub_values, y_attribute)
         elif self.current_graph == 'Scatter Plot':
-            x_attribute = self.x_axis_var.get()
-            y_attribute = self.y_axis_var.get()
-            selected_sub_values = self.get_selected_sub_values()
-            self.current_canvas = self.graph_controller.plot_scatter_plot(
-                self.left_frame,
-                x_attribute,
-                y_attribute
-            )
-            self.current_canvas.pack(pady=5)
+            job = lambda: self.graph_controller.plot_scatter_plot(x_attribute, y_attribute, exact=exact)
+        else:
+            return
+        self.worker.submit(job, lambda result: self.store_graph(key, result), self.display_error)
+        self.set_busy(True)
+
+    def store_graph(self, key, result):
+        """ keeps a built graph for repeat views and shows it """
+        self.chart_cache.put(key, result)
+        self.display_graph(result)
+
+    def cancel_graph(self, event=None):
+        """ drops a graph still being built once the selection changes """
+        if self.worker.busy:
+            self.worker.cancel()
+            self.set_busy(False)
+
+    def set_busy(self, busy):
+        """ shows or hides the progress bar """
+        if busy:
+            self.progress.pack(pady=5, side=tk.BOTTOM)
+            self.progress.start(10)
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
+
+    def display_graph(self, result):
+        """ shows a built graph """
+        self.set_busy(False)
+        self.chart_view.show_result(result)
+        self.chart_view.pack(pady=5)
+
+    def display_error(self, error):
+        """ shows why a graph could not be built """
+        self.set_busy(False)
+        self.chart_view.show_error(error)
+        self.chart_view.pack(pady=5)
 
     def get_selected_sub_values(self):
         """ get sub values"""
@@ -392,6 +785,7 @@ class DataExplorationPage(tk.Frame):
         # Remove the sub_frame if it exists
         if hasattr(self, 'sub_frame'):
             self.sub_frame.pack_forget()
+        self.cancel_graph()
 
 
         self.current_graph = self.graph_combobox_var.get()
@@ -402,6 +796,8 @@ class DataExplorationPage(tk.Frame):
         self.sub_frame = tk.Frame(self.right_frame)
         self.x_axis_var = tk.StringVar()
         self.y_axis_var = tk.StringVar()
+        self.exact_var = tk.BooleanVar(value=False)
+        self.confidence_var = tk.BooleanVar(value=False)
         self.x_axis_combobox = ttk.Combobox(self.sub_frame, textvariable=self.x_axis_var, width=42,
                                             font=self.font_combo)
         self.x_axis_combobox.bind('<<ComboboxSelected>>', self.sub_menu_handler)
@@ -409,7 +805,7 @@ class DataExplorationPage(tk.Frame):
         # Define a dictionary to map each X-axis option to its sub-values
 
         self.x_sub_values = {
-            'genres': self.df_sep_genres['genres'].unique(),
+            'genres': self.db.get_genres(),
             'original_language': self.df['original_language'].unique(),
             'release_year': self.df['release_year'].sort_values().unique()
         }
@@ -426,6 +822,7 @@ class DataExplorationPage(tk.Frame):
             self.x_axis_combobox['values'] = x_axis
 
         self.y_axis_combobox['values'] = y_axis
+        self.y_axis_combobox.bind('<<ComboboxSelected>>', self.cancel_graph)
 
         # Add labels between the comboboxes
         ttk.Label(self.sub_frame, text="X Axis:").pack()
@@ -436,9 +833,13 @@ class DataExplorationPage(tk.Frame):
         if self.current_graph == "Bar Graph" or self.current_graph == 'Line Plot':
             ttk.Label(self.sub_frame, text="Sub-Values:").pack()
             self.x_sub_listbox.pack()
+            if self.current_graph == "Bar Graph":
+                ttk.Checkbutton(self.sub_frame, text="Confidence intervals (slow)",
+                                variable=self.confidence_var).pack(pady=5)
         else:
             self.x_axis_combobox['values'] = num_att
             self.y_axis_combobox['values'] = num_att
+            ttk.Checkbutton(self.sub_frame, text="Draw every point", variable=self.exact_var).pack(pady=5)
 
         self.show_graph_button = ttk.Button(self.sub_frame, text="Show Graph",
                                             command=self.show_graph)  # Changed button name
@@ -449,6 +850,7 @@ class DataExplorationPage(tk.Frame):
         # Pack the sub_frame if the current graph type requires it
     def sub_menu_handler(self, *args):
         """ sub menu event handler """
+        self.cancel_graph()
         current_x = self.x_axis_var.get()
         if current_x in self.x_sub_values:
             sub_values = self.x_sub_values[current_x]
@@ -0,0 +1,93 @@
+"""
+Renders every storytelling chart of every language to files, without a display
+
+Usage: python report.py [--out reports] [--format png|svg|pdf] [--workers N] [--languages en fr ...]
+
+Run it from the folder holding movies_with_links.csv, like main.py. Charts are
+written to <out>/<language>/<story>.<format>; stories with text (statistics,
+correlation matrix) also get a .txt file next to them.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Database import MovieDB
+from MovieController import StorytellingGraph
+
+# Each worker process keeps its own graph (and its cache of LanguageStory)
+_graph = None
+
+
+def slug(text):
+    """ file name friendly version of text """
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(text)).strip('_').lower() or 'unknown'
+
+
+def init_worker(output):
+    """ load the catalog (only the storytelling columns, from the cache main() built) once per worker process """
+    global _graph
+    _graph = StorytellingGraph(db=MovieDB(pages=['storytelling']), output=output)
+
+
+def render_story(language, story, out_dir):
+    """
+    Render one story of one language into out_dir.
+
+    Returns:
+    - list: The paths written.
+    """
+    result = _graph.get_story(language, story)
+    folder = os.path.join(out_dir, slug(language))
+    os.makedirs(folder, exist_ok=True)
+    base = os.path.join(folder, slug(story))
+    paths = []
+    if result.text is not None:
+        with open(base + '.txt', 'w', encoding='utf-8') as file:
+            file.write(result.text + '\n')
+        paths.append(base + '.txt')
+    if result.data is not None:
+        with open(f'{base}.{result.format}', 'wb') as file:
+            file.write(result.data)
+        paths.append(f'{base}.{result.format}')
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the storytelling charts of every language to files.')
+    parser.add_argument('--out', default='reports', help='output folder (default: reports)')
+    parser.add_argument('--format', default='png', choices=['png', 'svg', 'pdf'], help='chart file format')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--languages', nargs='*', help='only these original languages (default: all)')
+    args = parser.parse_args(argv)
+
+    # Load once here first: on a cold start this builds the catalog cache, so
+    # the workers all read it instead of each parsing the CSV and writing it
+    catalog = MovieDB(pages=['storytelling'])
+    languages = args.languages
+    if not languages:
+        languages = sorted(catalog.orig_df['original_language'].dropna().unique())
+    del catalog
+
+    started = time.perf_counter()
+    failures = 0
+    written = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(args.format,)) as pool:
+        futures = {pool.submit(render_story, language, story, args.out): (language, story)
+                   for language in languages for story in StorytellingGraph.STORIES}
+        for future in as_completed(futures):
+            language, story = futures[future]
+            try:
+                written += len(future.result())
+            except Exception as error:
+                failures += 1
+                print(f'{language}: {story}: {error}', file=sys.stderr)
+
+    print(f'Wrote {written} files for {len(languages)} languages to {args.out} '
+          f'in {time.perf_counter() - started:.1f}s ({failures} failed)')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
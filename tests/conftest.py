@@ -0,0 +1,74 @@
+"""
+Shared fixtures: a small synthetic catalog in a temporary folder
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+GENRES = ['Action', 'Drama', 'Comedy', 'Crime', 'Horror', 'Romance', 'Science Fiction', 'Animation']
+LANGUAGES = ['en', 'fr', 'ja', 'ko', 'th']
+WORDS = ['Man', 'Batman', 'Superman', 'Night', 'Red', 'The', 'Return', 'Dark', 'Manhattan', 'Love', 'War', 'Woman']
+
+
+def make_catalog(rows=2000, seed=0):
+    """ a catalog DataFrame with the columns of movies_with_links.csv """
+    rng = np.random.default_rng(seed)
+    years = rng.integers(1950, 2024, rows)
+    budget = rng.integers(0, 3 * 10 ** 8, rows)
+    revenue = rng.integers(0, 3 * 10 ** 9, rows)
+    titles = [' '.join(rng.choice(WORDS, rng.integers(1, 4))) for _ in range(rows)]
+    genres = [str(list(rng.choice(GENRES, rng.integers(0, 4), replace=False))) for _ in range(rows)]
+    return pd.DataFrame({
+        'id': rng.permutation(rows * 3)[:rows] + 1,
+        'title': titles,
+        'release_date': [f'{year}-0{rng.integers(1, 10)}-1{rng.integers(0, 10)}' for year in years],
+        'genres': genres,
+        'original_language': rng.choice(LANGUAGES, rows, p=[0.6, 0.1, 0.1, 0.1, 0.1]),
+        'vote_average': rng.integers(0, 1000, rows) / 100,
+        'vote_count': rng.integers(0, 30000, rows),
+        'popularity': rng.integers(0, 1000000, rows) / 1000,
+        'overview': [f'Overview of movie {i}, which is rather long.' if i % 7 else np.nan for i in range(rows)],
+        'budget': budget,
+        'production_companies': ["['Studio A', 'Studio B']"] * rows,
+        'revenue': revenue,
+        'runtime': rng.integers(60, 200, rows),
+        'tagline': [f'Tagline {i}' if i % 5 else np.nan for i in range(rows)],
+        'release_year': years,
+        'profit': revenue - budget,
+        'imdb_link': [f'https://imdb.com/title/tt{i:07}/' for i in range(rows)],
+        'poster_link': [f'https://m.media-amazon.com/images/{i}.jpg' for i in range(rows)],
+    })
+
+
+def pytest_addoption(parser):
+    parser.addoption('--run-slow', action='store_true', help='also run the tests marked slow')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: takes minutes; only run with --run-slow')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--run-slow'):
+        return
+    skip = pytest.mark.skip(reason='slow; run with --run-slow')
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def catalog_dir(tmp_path, monkeypatch):
+    """ a folder holding movies_with_links.csv, made the working directory """
+    make_catalog().to_csv(tmp_path / 'movies_with_links.csv', index=False)
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    import Database
+    Database.close_movie_db()
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from AggregateCube import AggregateCube, merge_moments
+from conftest import make_catalog
+from MovieIndex import GenreIndex
+
+
+class Catalog:
+    """ the parts of MovieDB the cube reads """
+
+    def __init__(self, df):
+        self.orig_df = df
+        self.genre_index = GenreIndex(df['genres'])
+
+    def get_separated_genres(self, df):
+        return self.genre_index.explode(df)
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    df = make_catalog(3000, seed=1)
+    rng = np.random.default_rng(2)
+    # Huge values with a tiny spread: sums of squares cancel catastrophically here
+    df['revenue'] = 2_900_000_000 + rng.integers(0, 10, len(df))
+    return df
+
+
+def test_merge_moments_matches_numpy():
+    rng = np.random.default_rng(0)
+    values = 1e9 + rng.normal(0, 3, 1000)
+    cells = np.array_split(values, 7) + [np.array([])]
+    count = np.array([len(cell) for cell in cells])
+    mean = np.array([cell.mean() if len(cell) else np.nan for cell in cells])
+    m2 = np.array([((cell - cell.mean()) ** 2).sum() if len(cell) else 0.0 for cell in cells])
+    total, group_mean, group_m2 = merge_moments(count, mean, m2, np.zeros(len(cells), dtype=np.int64), 1)
+    assert total[0] == 1000
+    assert group_mean[0] == pytest.approx(values.mean(), rel=1e-15)
+    assert group_m2[0] / 999 == pytest.approx(values.var(ddof=1), rel=1e-6)
+
+
+def test_rollup_matches_pandas(catalog):
+    cube = AggregateCube(Catalog(catalog))
+    rolled = cube.rollup(['original_language'], measures=('revenue', 'budget')).set_index('original_language')
+    expected = catalog.groupby('original_language')[['revenue', 'budget']].agg(['count', 'mean', 'std', 'min', 'max'])
+    for measure in ('revenue', 'budget'):
+        for stat in ('count', 'mean', 'std', 'min', 'max'):
+            np.testing.assert_allclose(rolled[f'{measure}_{stat}'], expected[(measure, stat)], rtol=1e-6)
+
+
+def test_summary_by_genre_matches_pandas(catalog):
+    db = Catalog(catalog)
+    cube = AggregateCube(db)
+    summary = cube.summary({'genres': 'Drama', 'original_language': 'en'}, measures=('revenue',))
+    exploded = db.get_separated_genres(catalog)
+    values = exploded.loc[(exploded['genres'] == 'Drama') & (exploded['original_language'] == 'en'), 'revenue']
+    assert summary.loc['count', 'revenue'] == len(values)
+    assert summary.loc['mean', 'revenue'] == pytest.approx(values.mean(), rel=1e-12)
+    assert summary.loc['std', 'revenue'] == pytest.approx(values.std(), rel=1e-6)
@@ -0,0 +1,111 @@
+import asyncio
+import os
+
+import pandas as pd
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from CSVs_files import async_links, temp
+
+MOVIES = 20
+
+
+def imdb_app(hits):
+    """
+    A server answering like IMDb for titles 'Movie <n>'.
+
+    Movie 1 is throttled (429) once, Movie 2 always errors (500), Movie 3 is
+    forbidden (403), multiples of 5 are not found (404) and IMDb ids ending in
+    7 have no poster.
+    """
+    async def find(request):
+        title = request.query['q']
+        hits[title] = hits.get(title, 0) + 1
+        number = int(title.split()[-1])
+        if number == 1 and hits[title] == 1:
+            return web.Response(status=429)
+        if number == 2:
+            return web.Response(status=500)
+        if number == 3:
+            return web.Response(status=403)
+        if number % 5 == 0:
+            return web.Response(status=404)
+        return web.Response(text=f'<html><body><a href="/title/tt{number:07}/">{title}</a></body></html>',
+                            content_type='text/html')
+
+    async def title(request):
+        imdb_id = request.match_info['imdb_id']
+        if imdb_id.endswith('7'):
+            return web.Response(text='<html><body>No poster</body></html>', content_type='text/html')
+        return web.Response(text=f'<html><body><div class="ipc-media"><img src="https://img/{imdb_id}.jpg" '
+                                 f'srcset="https://img/{imdb_id}_l.jpg 2x"></div></body></html>',
+                            content_type='text/html')
+
+    app = web.Application()
+    app.add_routes([web.get('/find/', find), web.get('/title/{imdb_id}/', title)])
+    return app
+
+
+class JournalWatchingFetcher(async_links.HttpLinkFetcher):
+    """ records how many journal lines are on disk when each lookup starts """
+
+    def __init__(self, journal_path, **kwargs):
+        super().__init__(**kwargs)
+        self.journal_path = journal_path
+        self.lines_on_disk = []
+
+    async def fetch(self, title):
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding='utf-8') as journal:
+                self.lines_on_disk.append(sum(1 for _ in journal))
+        else:
+            self.lines_on_disk.append(0)
+        return await super().fetch(title)
+
+
+async def enrich_against_mock(input_path, output_path, hits, concurrency):
+    server = TestServer(imdb_app(hits))
+    await server.start_server()
+    fetcher = JournalWatchingFetcher(temp.journal_path_for(output_path), base_url=str(server.make_url('/')),
+                                     rate=0, retries=2, base_delay=0, concurrency=concurrency)
+    try:
+        counts = await async_links.enrich_async(input_path, output_path, fetcher, concurrency=concurrency)
+    finally:
+        await fetcher.close()
+        await server.close()
+    return counts, fetcher
+
+
+def test_enrich_against_a_mock_imdb(tmp_path):
+    input_path, output_path = str(tmp_path / 'movies.csv'), str(tmp_path / 'movies_with_links.csv')
+    pd.DataFrame({'id': range(1, MOVIES + 1), 'title': [f'Movie {i}' for i in range(1, MOVIES + 1)]}).to_csv(
+        input_path, index=False)
+    hits = {}
+    counts, fetcher = asyncio.run(enrich_against_mock(input_path, output_path, hits, concurrency=1))
+
+    assert counts == {'skipped': 0, 'ok': 14, 'not_found': 4, 'failed': 2}
+    # 429 retried once, 500 retried until retries ran out, 403 not retried
+    assert hits['Movie 1'] == 2 and hits['Movie 2'] == 3 and hits['Movie 3'] == 1
+    stats = fetcher.stats
+    assert stats.retries == 3
+    assert stats.errors == {'TransientError': 4, 'ClientResponseError': 1}
+    assert stats.counts == {'ok': 14, 'not_found': 4, 'failed': 2}
+    # A search per movie, the 3 retries and a poster page per found movie
+    assert stats.requests == MOVIES + 3 + 14
+
+    # Every finished movie was on disk before the next lookup started
+    assert fetcher.lines_on_disk == list(range(MOVIES))
+    journal = temp.read_journal(temp.journal_path_for(output_path))
+    assert {key: entry['status'] for key, entry in journal.items() if entry['status'] != 'ok'} == {
+        '2': 'failed', '3': 'failed', '5': 'not_found', '10': 'not_found', '15': 'not_found', '20': 'not_found'}
+    assert journal['1']['imdb_link'] == 'https://imdb.com/title/tt0000001/'
+    assert journal['17']['poster_link'] == temp.MISSING_LINK
+
+    # The next run only retries the failed movies
+    hits.clear()
+    counts, _ = asyncio.run(enrich_against_mock(input_path, output_path, hits, concurrency=4))
+    assert set(hits) == {'Movie 2', 'Movie 3'}
+    assert counts['skipped'] == MOVIES - 2
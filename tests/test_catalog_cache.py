@@ -0,0 +1,69 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import CatalogCache
+from conftest import make_catalog
+
+
+def test_round_trip(tmp_path):
+    csv_path = str(tmp_path / 'movies.csv')
+    df = make_catalog(200)
+    df.to_csv(csv_path, index=False)
+    CatalogCache.write_cache(df, csv_path)
+    pd.testing.assert_frame_equal(CatalogCache.read_cache(csv_path), df, check_dtype=False)
+    assert CatalogCache.read_cache(csv_path, columns=['title'])['title'].tolist() == df['title'].tolist()
+
+
+def test_concurrent_builds_never_expose_a_broken_cache(tmp_path):
+    csv_path = str(tmp_path / 'movies.csv')
+    df = make_catalog(3000)
+    df.to_csv(csv_path, index=False)
+    errors = []
+    done = threading.Event()
+
+    def build():
+        try:
+            for _ in range(5):
+                CatalogCache.write_cache(df, csv_path)
+        except Exception as error:
+            errors.append(error)
+
+    def read():
+        while not done.is_set():
+            try:
+                data = CatalogCache.read_cache(csv_path, mmap=False)
+                if data is not None:
+                    pd.testing.assert_frame_equal(data, df, check_dtype=False)
+            except FileNotFoundError:
+                # Between moving the old cache aside and publishing the new one
+                continue
+            except Exception as error:
+                errors.append(error)
+                return
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    builders = [threading.Thread(target=build) for _ in range(4)]
+    for builder in builders:
+        builder.start()
+    for builder in builders:
+        builder.join()
+    done.set()
+    reader.join()
+
+    assert not errors
+    pd.testing.assert_frame_equal(CatalogCache.read_cache(csv_path), df, check_dtype=False)
+    # No temporary or retired directories are left behind
+    assert sorted(os.listdir(tmp_path)) == ['movies.csv', 'movies.csv.cache']
+
+
+def test_missing_columns_raise(tmp_path):
+    csv_path = str(tmp_path / 'movies.csv')
+    df = make_catalog(50)
+    df.to_csv(csv_path, index=False)
+    CatalogCache.write_cache(df, csv_path)
+    with pytest.raises(KeyError, match='vote_total'):
+        CatalogCache.read_cache(csv_path, columns=['title', 'vote_total'])
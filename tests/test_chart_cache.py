@@ -0,0 +1,43 @@
+from Database import add_reload_listener, get_movie_db, reload_movie_db
+from MovieController import ChartCache, ChartResult
+from conftest import make_catalog
+
+STORY = 'Histogram of revenue and budget'
+
+
+class Page:
+    """ holds the shared catalog and a chart cache the way the chart pages do """
+
+    def __init__(self):
+        self.db = get_movie_db()
+        self.chart_cache = ChartCache()
+        add_reload_listener(self.set_db)
+
+    def set_db(self, db):
+        self.db = db
+        self.chart_cache.clear()
+
+    def key(self):
+        return self.chart_cache.key(self.db, 'story', STORY, 'en')
+
+
+def test_reloading_the_catalog_misses_the_cache(catalog_dir):
+    page = Page()
+    page.chart_cache.put(page.key(), ChartResult(text='before'))
+    assert page.chart_cache.get(page.key()).text == 'before'
+
+    changed = make_catalog(seed=1)
+    changed.to_csv(catalog_dir / 'movies_with_links.csv', index=False)
+    reload_movie_db()
+
+    assert page.db is get_movie_db()
+    assert page.db.orig_df['id'].tolist() == changed['id'].tolist()
+    assert page.chart_cache.get(page.key()) is None
+
+
+def test_a_new_catalog_version_misses_the_cache(catalog_dir):
+    cache = ChartCache()
+    db = get_movie_db()
+    cache.put(cache.key(db, 'story', STORY, 'en'), ChartResult(text='before'))
+    db = reload_movie_db()
+    assert cache.get(cache.key(db, 'story', STORY, 'en')) is None
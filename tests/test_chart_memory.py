@@ -0,0 +1,37 @@
+import itertools
+import os
+import resource
+
+import pytest
+
+from Database import MovieDB
+from MovieController import StorytellingGraph
+
+CHARTS = 1000
+WARM_UP = 50
+MAX_GROWTH = 30 * 2 ** 20
+
+
+def resident_bytes():
+    """ current RSS (peak RSS where /proc is not available) """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        scale = 1 if os.uname().sysname == 'Darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+@pytest.mark.slow
+def test_switching_charts_does_not_grow_memory(catalog_dir):
+    graph = StorytellingGraph(db=MovieDB())
+    charts = itertools.cycle([(language, story) for language in ('en', 'fr') for story in graph.STORIES])
+    # Fonts, glyph caches and the per-language stories fill up first
+    for _ in range(WARM_UP):
+        graph.get_story(*next(charts))
+
+    before = resident_bytes()
+    for _ in range(CHARTS):
+        graph.get_story(*next(charts))
+    assert not graph.figure.figure.axes
+    assert resident_bytes() - before < MAX_GROWTH
@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import CatalogCache
+from conftest import make_catalog
+from Database import MovieDB, catalog_loader, load_catalog, compact_dtypes, memory_report
+
+
+def test_get_movie_by_id(catalog_dir):
+    db = MovieDB()
+    catalog = pd.read_csv(catalog_dir / 'movies_with_links.csv')
+    for row in (0, 5, len(catalog) - 1):
+        assert db.get_movie(int(catalog.loc[row, 'id']))['title'] == catalog.loc[row, 'title']
+    with pytest.raises(KeyError):
+        db.get_movie(int(catalog['id'].max()) + 1)
+
+
+def test_get_movie_with_duplicate_ids(tmp_path, monkeypatch):
+    catalog = make_catalog(50)
+    catalog.loc[[10, 30], 'id'] = catalog.loc[3, 'id']
+    catalog.to_csv(tmp_path / 'movies_with_links.csv', index=False)
+    monkeypatch.chdir(tmp_path)
+    # Duplicate ids resolve to the first movie with the id
+    assert MovieDB().get_movie(int(catalog.loc[3, 'id']))['title'] == catalog.loc[3, 'title']
+
+
+def test_compact_dtypes_never_changes_values():
+    df = pd.DataFrame({
+        'small': [1, 2, 3],
+        'with_missing': [1.0, np.nan, 3.0],
+        'too_big': [0, 1, 2 ** 40],
+        'negative': [-1, 0, 1],
+        'language': ['en', 'fr', 'en'],
+        'score': [0.5, 1.5, 2.5],
+    })
+    schema = {'small': 'int16', 'with_missing': 'uint32', 'too_big': 'uint32', 'negative': 'uint32',
+              'language': 'category', 'score': 'float32', 'not_there': 'int16'}
+    compacted = compact_dtypes(df.copy(), schema)
+    assert compacted['small'].dtype == 'int16'
+    assert compacted['language'].dtype == 'category'
+    assert compacted['score'].dtype == 'float32'
+    # Missing or out of range values keep their dtype
+    for column in ('with_missing', 'too_big', 'negative'):
+        assert compacted[column].dtype == df[column].dtype
+    pd.testing.assert_frame_equal(compacted, df, check_dtype=False, check_categorical=False)
+
+
+def test_memory_report():
+    before = pd.DataFrame({'language': ['en', 'fr'] * 500, 'year': np.arange(1000) + 1000})
+    after = compact_dtypes(before.copy(), {'language': 'category', 'year': 'int16'})
+    report = memory_report(before, after)
+    assert report.index.tolist() == ['language', 'year', 'total']
+    assert report.loc['year', 'bytes_before'] == 8000 and report.loc['year', 'bytes_after'] == 2000
+    assert report.loc['year', 'ratio'] == 4.0
+    assert report.loc['language', 'dtype_after'] == 'category'
+    assert report.loc['total', 'bytes_after'] == report.loc[['language', 'year'], 'bytes_after'].sum()
+
+
+def test_get_row(catalog_dir):
+    db = MovieDB()
+    catalog = pd.read_csv(catalog_dir / 'movies_with_links.csv')
+    assert [db.get_row(int(movie_id)) for movie_id in catalog['id'][:20]] == list(range(20))
+
+
+def test_text_without_a_cache_is_read_on_demand(catalog_dir, monkeypatch):
+    with monkeypatch.context() as patch:
+        # A folder no cache can be written to
+        patch.setattr(os, 'access', lambda path, mode: False)
+        db = MovieDB()
+    assert not os.path.exists(CatalogCache.cache_dir_for(str(catalog_dir / db.csv_name)))
+    catalog = pd.read_csv(catalog_dir / db.csv_name)
+    read_csv = pd.read_csv
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError('warm_up() read the CSV')
+    with monkeypatch.context() as patch:
+        patch.setattr(pd, 'read_csv', no_parsing)
+        db.warm_up()
+
+    reads = []
+    monkeypatch.setattr(pd, 'read_csv', lambda *args, **kwargs: reads.append(kwargs) or read_csv(*args, **kwargs))
+    db.load_text_columns(('tagline', 'overview'))
+    for row in (0, 1, 7):
+        movie_id = int(catalog.loc[row, 'id'])
+        for column in ('overview', 'tagline'):
+            expected = catalog.loc[row, column]
+            text = db.get_text(movie_id, column)
+            assert text == expected or (pd.isna(expected) and pd.isna(text))
+    # Both columns in one pass
+    assert [sorted(kwargs['usecols']) for kwargs in reads] == [['overview', 'tagline']]
+
+
+def test_unknown_columns_raise(catalog_dir):
+    with pytest.raises(KeyError, match='vote_total'):
+        catalog_loader(str(catalog_dir), 'movies_with_links.csv', ['id', 'vote_total'])
+    # Now from the cache the first call built
+    with pytest.raises(KeyError, match='vote_total'):
+        catalog_loader(str(catalog_dir), 'movies_with_links.csv', ['id', 'vote_total'])
+    assert np.array_equal(catalog_loader(str(catalog_dir), 'movies_with_links.csv', ['id'])['id'],
+                          pd.read_csv(catalog_dir / 'movies_with_links.csv')['id'])
+
+
+def test_text_stays_with_the_catalog_it_was_loaded_with(catalog_dir):
+    catalog = pd.read_csv(catalog_dir / 'movies_with_links.csv')
+    db = MovieDB()
+    # The CSV changes and another MovieDB rebuilds the cache
+    catalog.iloc[::-1].to_csv(catalog_dir / 'movies_with_links.csv', index=False)
+    MovieDB()
+    for row in (0, 1, 7):
+        expected = catalog.loc[row, 'overview']
+        text = db.get_text(int(catalog.loc[row, 'id']), 'overview')
+        assert text == expected or (pd.isna(expected) and pd.isna(text))
+
+
+def test_lost_cache_races_fall_back_to_the_csv(catalog_dir, monkeypatch):
+    MovieDB()
+    calls = []
+
+    def moved_away(*args):
+        calls.append(args)
+        raise FileNotFoundError('cache moved away')
+    monkeypatch.setattr(CatalogCache, '_read_columns', moved_away)
+    data, texts = load_catalog(str(catalog_dir), 'movies_with_links.csv', ['id'], ['overview'])
+    assert len(calls) == CatalogCache.READ_ATTEMPTS
+    assert list(texts) == ['overview']
+    assert np.array_equal(data['id'], pd.read_csv(catalog_dir / 'movies_with_links.csv')['id'])
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from Database import MovieDB
+from MovieController import ExplorationGraph
+
+
+def bar_heights(result):
+    ax = result.figure.axes[0]
+    return np.array([patch.get_height() for patch in ax.patches])
+
+
+@pytest.mark.parametrize('x_attribute, x_sub_var', [
+    ('genres', []),
+    ('genres', ['Drama', 'Crime']),
+    ('original_language', []),
+    ('original_language', ['fr', 'ja']),
+    ('original_language', 'en'),
+    ('release_year', ['1990', '2001', '2015']),
+])
+def test_confidence_bars_have_the_same_means(catalog_dir, x_attribute, x_sub_var):
+    graph = ExplorationGraph(db=MovieDB(), output='figure')
+    means = bar_heights(graph.plot_bar_graph(x_attribute, x_sub_var, 'revenue'))
+    with_confidence = bar_heights(graph.plot_bar_graph(x_attribute, x_sub_var, 'revenue', confidence=True))
+    assert len(means) > 0
+    np.testing.assert_allclose(with_confidence, means, rtol=1e-9)
+
+
+def test_scatter_threshold_counts_the_markers_drawn(catalog_dir):
+    db = MovieDB()
+    markers = int(db.sep_genre_df['genres'].notna().sum())
+    assert markers != len(db.sep_genre_df) and markers != len(db.orig_df)
+    for threshold, density in ((markers, False), (markers - 1, True)):
+        result = ExplorationGraph(db=db, density_threshold=threshold, output='figure').plot_scatter_plot(
+            'budget', 'revenue')
+        ax = result.figure.axes[0]
+        assert ax.get_title().startswith('Density') == density
+        if not density:
+            assert len(ax.collections[0].get_offsets()) == markers
@@ -0,0 +1,154 @@
+import io
+import json
+import os
+import threading
+import urllib.error
+from http.client import IncompleteRead
+
+import movieposters.errors
+import numpy as np
+import pandas as pd
+import pytest
+
+from CSVs_files import temp
+
+
+class StubLookups:
+    """
+    Stand-in for movieposters.
+
+    Titles ending in 0 are not found, IMDb links ending in 7 have no poster,
+    flaky titles fail once with a transient error and broken titles always do.
+    """
+
+    def __init__(self, flaky=(), broken=(), crash_after=None):
+        self.flaky = set(flaky)
+        self.broken = set(broken)
+        self.crash_after = crash_after
+        self.searched = []
+        self.lock = threading.Lock()
+
+    def search(self, title):
+        with self.lock:
+            self.searched.append(title)
+            if self.crash_after is not None and len(self.searched) > self.crash_after:
+                raise KeyboardInterrupt
+            if title in self.flaky:
+                self.flaky.discard(title)
+                raise IncompleteRead(b'')
+        if title in self.broken:
+            raise ConnectionResetError(title)
+        if not isinstance(title, str) or title.endswith('0'):
+            raise movieposters.errors.MovieNotFound(title)
+        return f'https://imdb.com/title/{title.replace(" ", "")}/'
+
+    def poster(self, link):
+        if link.endswith('7/'):
+            raise movieposters.errors.PosterNotFound(link)
+        return link + 'poster.jpg'
+
+    def fetcher(self):
+        return temp.LinkFetcher(imdb_lookup=self.search, poster_lookup=self.poster, rate=0, retries=2,
+                                base_delay=0)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    input_path = tmp_path / 'movies.csv'
+    pd.DataFrame({'id': range(40), 'title': [f'Movie {i}' for i in range(40)]}).to_csv(input_path, index=False)
+    return str(input_path), str(tmp_path / 'movies_with_links.csv')
+
+
+def test_retries_transient_errors(paths):
+    stub = StubLookups(flaky=['Movie 1', 'Movie 2'], broken=['Movie 3'])
+    counts = temp.enrich(*paths, fetcher=stub.fetcher(), workers=4)
+    assert counts == {'skipped': 0, 'ok': 35, 'not_found': 4, 'failed': 1}
+    assert stub.searched.count('Movie 1') == 2
+    assert stub.searched.count('Movie 3') == 3
+
+    out = pd.read_csv(paths[1], keep_default_na=False).set_index('id')
+    assert out.loc[1, 'imdb_link'] == 'https://imdb.com/title/Movie1/'
+    assert out.loc[17, 'imdb_link'] != temp.MISSING_LINK and out.loc[17, 'poster_link'] == temp.MISSING_LINK
+    assert out.loc[3, 'imdb_link'] == temp.MISSING_LINK
+
+
+def test_known_movies_are_skipped(paths):
+    temp.enrich(*paths, fetcher=StubLookups(broken=['Movie 3']).fetcher(), workers=4)
+    stub = StubLookups()
+    counts = temp.enrich(*paths, fetcher=stub.fetcher(), workers=4)
+    # Only the failed movie is tried again; not found is final
+    assert stub.searched == ['Movie 3']
+    assert counts['skipped'] == 39 and counts['ok'] == 1
+
+
+def test_resumes_after_a_crash(paths):
+    with pytest.raises(KeyboardInterrupt):
+        temp.enrich(*paths, fetcher=StubLookups(crash_after=15).fetcher(), workers=1)
+    with open(temp.journal_path_for(paths[1])) as journal:
+        done = {json.loads(line)['title'] for line in journal}
+    assert len(done) == 15
+
+    stub = StubLookups()
+    counts = temp.enrich(*paths, fetcher=stub.fetcher(), workers=4)
+    assert counts['skipped'] == 15
+    assert set(stub.searched) == {f'Movie {i}' for i in range(40)} - done
+    assert len(temp.read_journal(temp.journal_path_for(paths[1]))) == 40
+    assert pd.read_csv(paths[1], keep_default_na=False)['imdb_link'].str.len().gt(0).all()
+
+
+def test_missing_titles_are_not_changed_titles(paths):
+    input_path, output_path = paths
+    movies = pd.read_csv(input_path)
+    movies.loc[5, 'title'] = np.nan
+    movies.to_csv(input_path, index=False)
+    temp.enrich(input_path, output_path, fetcher=StubLookups().fetcher(), workers=4)
+
+    stub = StubLookups()
+    assert temp.enrich(input_path, output_path, fetcher=stub.fetcher(), workers=4)['skipped'] == 40
+    assert stub.searched == []
+
+
+def test_retitles_are_noticed_after_seeding_from_the_output(paths):
+    input_path, output_path = paths
+    temp.enrich(input_path, output_path, fetcher=StubLookups().fetcher(), workers=4)
+    # An output written by an older version, without a journal
+    os.remove(temp.journal_path_for(output_path))
+    movies = pd.read_csv(input_path)
+    movies.loc[4, 'title'] = 'Movie 4 Redux'
+    movies.to_csv(input_path, index=False)
+
+    stub = StubLookups()
+    temp.enrich(input_path, output_path, fetcher=stub.fetcher(), workers=4)
+    # Movies without links are retried too: the output can't tell not found from failed
+    assert set(stub.searched) == {'Movie 4 Redux', 'Movie 0', 'Movie 10', 'Movie 20', 'Movie 30'}
+
+
+@pytest.mark.parametrize('errors, status', [(0, 'ok'), (2, 'ok'), (3, 'failed')])
+def test_poster_requests_retry_http_503(monkeypatch, errors, status):
+    link = 'https://imdb.com/title/tt0000001/'
+    page = b'<div class="ipc-media"><img src="https://m.media-amazon.com/images/1.jpg"></div>'
+    requests = []
+
+    def urlopen(request):
+        requests.append(request.full_url)
+        if len(requests) <= errors:
+            raise urllib.error.HTTPError(request.full_url, 503, 'Service Unavailable', {}, None)
+        return io.BytesIO(page)
+    monkeypatch.setattr(temp.urllib.request, 'urlopen', urlopen)
+
+    fetcher = temp.LinkFetcher(imdb_lookup=lambda title: link, rate=0, retries=2, base_delay=0)
+    entry = fetcher.fetch('Movie 1')
+    assert requests == [link] * min(errors + 1, 3)
+    assert entry['status'] == status and entry['imdb_link'] == link
+    if status == 'ok':
+        assert entry['poster_link'] == 'https://m.media-amazon.com/images/1.jpg'
+
+
+def test_poster_page_not_found(monkeypatch):
+    def urlopen(request):
+        raise urllib.error.HTTPError(request.full_url, 404, 'Not Found', {}, None)
+    monkeypatch.setattr(temp.urllib.request, 'urlopen', urlopen)
+
+    entry = temp.LinkFetcher(imdb_lookup=lambda title: 'https://imdb.com/title/tt0000001/', rate=0).fetch('Movie 1')
+    assert entry['status'] == 'ok' and entry['poster_link'] == temp.MISSING_LINK
+    assert 'MovieNotFound' in entry['error']
@@ -0,0 +1,47 @@
+from LRUCache import LRUCache
+
+
+def test_evicts_the_least_recently_used():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert len(cache) == 2
+    assert LRUCache(0).max_entries == 1
+
+
+def test_get_or_create_calls_the_factory_once():
+    cache = LRUCache(2)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return 'value'
+    assert cache.get_or_create('key', factory) == 'value'
+    assert cache.get_or_create('key', factory) == 'value'
+    assert len(calls) == 1
+    cache.clear()
+    assert cache.get('key', 'missing') == 'missing'
+
+
+def test_weight_limit_evicts_the_least_recently_used():
+    cache = LRUCache(10, max_weight=10, weigh=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'xxxx')
+    cache.get('a')
+    cache.put('c', 'xxxx')
+    # 12 is over the limit: b is the least recently used
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.weight == 8
+    # Replacing a value weighs it again
+    cache.put('a', 'x')
+    assert cache.weight == 5
+    # Too heavy on its own: not stored, nothing evicted
+    cache.put('huge', 'x' * 11)
+    assert 'huge' not in cache and cache.weight == 5
+    assert cache.pop('a') == 'x' and cache.weight == 4
+    cache.clear()
+    assert cache.weight == 0 and len(cache) == 0
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_catalog
+from MovieIndex import GenreIndex, TitleIndex, YearIndex, parse_genres
+
+FEW_GENRES = ['Action', 'Drama', 'Comedy', 'Science', 'Science Fiction', 'Horror']
+MANY_GENRES = [f'Genre {i}' for i in range(70)]
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    df = make_catalog(500)
+    df['genres'] = df['genres'].astype('category')
+    return df
+
+
+def expected_explode(df):
+    expected = df.assign(genres=[parse_genres(text) or [np.nan] for text in df['genres']]).explode('genres')
+    return expected.reset_index(drop=True)
+
+
+def test_explode_matches_pandas(catalog):
+    index = GenreIndex(catalog['genres'])
+    subset = catalog[catalog['original_language'] == 'fr']
+    exploded = index.explode(subset)
+    expected = expected_explode(subset)
+    assert exploded['id'].tolist() == expected['id'].tolist()
+    assert exploded['genres'].fillna('').tolist() == expected['genres'].fillna('').tolist()
+
+
+def test_explode_rejects_a_reset_index(catalog):
+    index = GenreIndex(catalog['genres'])
+    subset = catalog.iloc[100:200]
+    with pytest.raises(ValueError):
+        index.explode(subset.reset_index(drop=True))
+    with pytest.raises(ValueError):
+        index.explode(pd.concat([subset, subset]).reset_index(drop=True))
+
+
+def test_explode_with_explicit_rows(catalog):
+    index = GenreIndex(catalog['genres'])
+    subset = catalog.iloc[100:200]
+    exploded = index.explode(subset.reset_index(drop=True), rows=np.arange(100, 200))
+    assert exploded['genres'].fillna('').tolist() == expected_explode(subset)['genres'].fillna('').tolist()
+
+
+def genre_lists(count, names, seed=0):
+    rng = np.random.default_rng(seed)
+    return [[str(name) for name in rng.choice(names, rng.integers(0, 4), replace=False)] for _ in range(count)]
+
+
+def expected_mask(lists, genres, mode):
+    genres = set(genres)
+    if mode == 'any':
+        return np.array([bool(genres & set(names)) for names in lists])
+    if mode == 'all':
+        return np.array([genres <= set(names) for names in lists])
+    return np.array([not genres & set(names) for names in lists])
+
+
+@pytest.mark.parametrize('names', [FEW_GENRES, MANY_GENRES], ids=['bitmask', 'matrix'])
+@pytest.mark.parametrize('mode', GenreIndex.MATCH_MODES)
+def test_genre_mask_matches_sets(names, mode):
+    lists = genre_lists(500, names)
+    index = GenreIndex(pd.Series([str(genres) for genres in lists] + [np.nan]))
+    lists.append([])
+    # More than 64 genres do not fit the bitmask
+    assert (index.bits is None) == (len(names) > 64)
+    for genres in ([names[0]], names[1:3], names[:5], []):
+        np.testing.assert_array_equal(index.mask(genres, mode), expected_mask(lists, genres, mode))
+
+
+def test_genre_mask_unknown_genres_and_exact_names():
+    index = GenreIndex(pd.Series(["['Action', 'Drama']", "['Drama']", "['Science Fiction']", '[]']))
+    # Nobody has Western, so nobody has all of these
+    assert not index.mask(['Western'], 'all').any()
+    assert not index.mask(['Drama', 'Western'], 'all').any()
+    assert index.mask(['Drama', 'Western'], 'any').tolist() == [True, True, False, False]
+    assert index.mask(['Action', 'Western'], 'none').tolist() == [False, True, True, True]
+    # 'Science' is part of 'Science Fiction' but a different genre
+    assert not index.mask(['Science'], 'any').any()
+    with pytest.raises(ValueError):
+        index.mask(['Drama'], 'some')
+
+
+def test_year_index_bounds():
+    years = pd.Series([1999, 2001, np.nan, 1999, 2005, 2001, 2003])
+    index = YearIndex(years)
+
+    def expected(low, high):
+        return [row for row, year in enumerate(years) if not np.isnan(year)
+                and (low is None or year >= low) and (high is None or year <= high)]
+
+    for low, high in [(None, None), (1999, 1999), (2000, 2002), (1990, 1998), (2006, 2010), (2005, None),
+                      (None, 1999), (2000.5, 2003.2), (2004, 2002)]:
+        rows = index.rows_between(low, high)
+        assert sorted(rows.tolist()) == expected(low, high)
+        assert index.count_between(low, high) == len(rows)
+    assert index.rows(2001).tolist() == [1, 5]
+    assert index.rows(2002).tolist() == []
+    assert index.rows_in([2005, 1999]).tolist() == [0, 3, 4]
+    assert YearIndex(pd.Series([np.nan])).count_between() == 0
+
+
+def test_title_search_finds_substrings(catalog):
+    index = TitleIndex(catalog['title'])
+    for query in ('man', 'Man', 'atma', 'night red', 'n'):
+        rows = index.search(query)
+        expected = np.flatnonzero(catalog['title'].str.lower().str.contains(query.lower(), regex=False))
+        # Every substring match is found (word-prefix matches may come on top)
+        assert set(expected) <= set(rows)
+        assert len(set(rows)) == len(rows)
+    titles = set(catalog['title'].iloc[index.search('man')])
+    assert {'Batman', 'Superman', 'Woman'} <= titles
+
+
+def test_title_search_ranking():
+    titles = pd.Series(['Batman', 'Man', 'Superman Man', 'The Man', 'Man of War', 'Manhattan', 'Love'])
+    index = TitleIndex(titles)
+    ranked = titles[index.search('man')].tolist()
+    # Exact, then starts with the query, then word matches, then inside a word
+    assert ranked == ['Man', 'Manhattan', 'Man of War', 'The Man', 'Superman Man', 'Batman']
+    # Word matches ignore word order
+    assert titles[index.search('war man')].tolist() == ['Man of War']
+    assert titles[index.search('man war')].tolist() == ['Man of War']
+    assert titles[index.search('of wa')].tolist() == ['Man of War']
+    assert titles[index.search('erman ma')].tolist() == ['Superman Man']
+    # Nothing matches: fuzzy fallback
+    assert titles[index.search('manhatan')].tolist()[0] == 'Manhattan'
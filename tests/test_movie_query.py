@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from MovieQuery import SortedRows
+
+
+@pytest.mark.parametrize('index', [
+    slice(None, 10), slice(None, -5), slice(-5, None), slice(3, -990), slice(-999, -990), slice(5, 2),
+    slice(None, None, -1), slice(-3, 2, -1), slice(10, 100, 7), slice(None, -2000), slice(None, 5000),
+])
+def test_slices_match_a_full_sort(index):
+    rng = np.random.default_rng(0)
+    rows = rng.permutation(1000) * 3
+    keys = rng.integers(0, 50, 1000)
+    expected = rows[np.argsort(keys, kind='stable')]
+    sorted_rows = SortedRows(rows, keys)
+    # Read a small prefix first so later reads extend a partial order
+    sorted_rows[:3]
+    assert sorted_rows[index].tolist() == expected[index].tolist()
+
+
+def test_positions():
+    rows = np.arange(100)[::-1]
+    keys = np.arange(100)[::-1]
+    sorted_rows = SortedRows(rows, keys)
+    assert sorted_rows[0] == 0
+    assert sorted_rows[-1] == 99
+    with pytest.raises(IndexError):
+        sorted_rows[100]
+    assert np.asarray(sorted_rows).tolist() == list(range(100))
@@ -0,0 +1,203 @@
+"""
+SearchPage logic, driven without a display: widgets are replaced by stand-ins
+"""
+from types import SimpleNamespace
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_catalog
+from Database import MovieDB, add_reload_listener, get_movie_db, reload_movie_db
+
+# movie_ui selects the Tk backend on import, which fails once pyplot runs headless
+_use = matplotlib.use
+matplotlib.use = lambda *args, **kwargs: None
+try:
+    import movie_ui
+    from movie_ui import MainApplication, SearchPage, VirtualTreeview
+finally:
+    matplotlib.use = _use
+
+
+class Widget(dict):
+    """ stands in for an entry or combobox (get()) and a label (['text']) """
+
+    def __init__(self, value=''):
+        super().__init__(text='')
+        self.value = value
+
+    def get(self, *args):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class Listbox:
+    def __init__(self):
+        self.values = []
+        self.selected = []
+
+    def get(self, index):
+        return self.values[index]
+
+    def curselection(self):
+        return tuple(self.selected)
+
+    def delete(self, first, last):
+        self.values, self.selected = [], []
+
+    def insert(self, index, value):
+        self.values.append(value)
+
+    def selection_set(self, index):
+        self.selected.append(index)
+
+
+class Results:
+    def __init__(self):
+        self.rows = None
+        self.focus = None
+
+    def set_rows(self, rows):
+        self.rows = list(rows)
+
+    def focused_row(self):
+        return self.focus
+
+
+class Worker:
+    """ runs submitted work right away """
+
+    def submit(self, work, callback):
+        callback(work())
+
+    def cancel(self):
+        pass
+
+
+def make_page(db):
+    """ a SearchPage with stand-ins for the widgets filter_results() and schedule_search() use """
+    page = SearchPage.__new__(SearchPage)
+    page.db = db
+    page.df = db.get_orig_df()
+    page.search_input = Widget()
+    page.release_year_from = Widget()
+    page.release_year_to = Widget()
+    page.rating_combobox = Widget('None')
+    page.popularity_combobox = Widget('None')
+    page.sort_priority_combobox = Widget('Popularity first')
+    page.genre_match_combobox = Widget('Any of')
+    page.lang_combobox = Widget()
+    page.genre_list_box = Listbox()
+    page.filter_message = Widget()
+    page.results_tree_view = Results()
+    page.fill_filters()
+    page.load_result_columns()
+    page.details_worker = Worker()
+    page.display_details = lambda details: setattr(page, 'details', details)
+    page.search_job = None
+    page.typed_text = ''
+    page.scheduled = []
+    page.after = lambda delay, callback: page.scheduled.append(callback) or len(page.scheduled)
+    page.after_cancel = lambda job: None
+    return page
+
+
+def test_only_keys_that_change_the_text_search(catalog_dir):
+    page = make_page(get_movie_db())
+    page.search_input.value = 'man'
+    page.schedule_search()
+    # Shift, arrows, Return...: same text
+    page.schedule_search()
+    page.schedule_search()
+    assert len(page.scheduled) == 1
+    page.search_input.value = 'ma'
+    page.schedule_search()
+    assert len(page.scheduled) == 2
+
+
+@pytest.mark.parametrize('year', ['19x', '2000.5', '-'])
+def test_bad_years_keep_the_results(catalog_dir, year):
+    page = make_page(get_movie_db())
+    page.filter_results()
+    shown = page.results_tree_view.rows
+    page.release_year_from.value = year
+    page.filter_results()
+    assert page.results_tree_view.rows == shown
+    assert repr(year) in page.filter_message['text']
+
+    page.release_year_from.value = ' 2000 '
+    page.filter_results()
+    assert page.filter_message['text'] == ''
+    years = page.db.orig_df['release_year'].to_numpy()
+    assert page.results_tree_view.rows and (years[page.results_tree_view.rows] >= 2000).all()
+
+
+@pytest.fixture
+def duplicate_ids(tmp_path, monkeypatch):
+    """ a catalog where rows 3, 10 and 30 share an id """
+    catalog = make_catalog(50)
+    catalog.loc[[10, 30], 'id'] = catalog.loc[3, 'id']
+    catalog.to_csv(tmp_path / 'movies_with_links.csv', index=False)
+    monkeypatch.chdir(tmp_path)
+    return catalog
+
+
+def test_rows_are_items_even_with_duplicate_ids(duplicate_ids):
+    inserted = []
+    view = VirtualTreeview.__new__(VirtualTreeview)
+    view.row_values = lambda rows: [(row,) for row in rows]
+    view.scrollbar = None
+    view.visible_count = lambda: 10
+    view.get_children = lambda: ()
+    view.delete = lambda *items: None
+    view.insert = lambda parent, index, iid, values: inserted.append(iid)
+    view.set_rows(np.array([3, 10, 30, 4]))
+    assert inserted == ['3', '10', '30', '4']
+
+
+def test_details_and_links_follow_the_row(duplicate_ids, monkeypatch):
+    page = make_page(MovieDB())
+    opened = []
+    monkeypatch.setattr(movie_ui.webbrowser, 'open', opened.append)
+    for row in (3, 10, 30):
+        page.results_tree_view.focus = row
+        page.show_details()
+        page.open_imdb_link(None)
+        expected = [duplicate_ids.loc[row, column] for column in ('tagline', 'overview')]
+        assert page.details == [text for text in expected if not pd.isna(text)]
+        assert opened[-1] == duplicate_ids.loc[row, 'imdb_link']
+
+
+def test_reload_rebuilds_the_search_page(catalog_dir):
+    page = make_page(get_movie_db())
+    app = MainApplication.__new__(MainApplication)
+    app.search_page = page
+    app.data_storytelling_tab = app.data_exploration_tab = SimpleNamespace(page=None)
+    add_reload_listener(app.on_catalog_reloaded)
+    page.genre_list_box.selection_set(page.genre_list_box.values.index('Drama'))
+    page.lang_combobox.set('th')
+    page.filter_results()
+
+    # A smaller catalog with a new genre and without Thai movies
+    changed = make_catalog(500, seed=1)
+    changed['genres'] = changed['genres'].str.replace('Horror', 'Western')
+    changed['original_language'] = changed['original_language'].replace('th', 'de')
+    changed.to_csv(catalog_dir / 'movies_with_links.csv', index=False)
+    reload_movie_db()
+
+    assert page.db is get_movie_db() and app.movie_db is page.db
+    assert page.genre_list_box.values == page.db.get_genres()
+    assert 'Western' in page.genre_list_box.values and 'Horror' not in page.genre_list_box.values
+    assert [page.genre_list_box.get(index) for index in page.genre_list_box.curselection()] == ['Drama']
+    assert sorted(page.lang_combobox['values']) == sorted(changed['original_language'].unique())
+    assert page.lang_combobox.get() == ''
+
+    rows = page.results_tree_view.rows
+    assert rows and max(rows) < len(changed)
+    assert all('Drama' in genres for genres in changed['genres'].iloc[rows])
+    titles = [values[0] for values in page.get_row_values(np.array(rows))]
+    assert titles == changed['title'].iloc[rows].tolist()